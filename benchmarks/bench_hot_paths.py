@@ -0,0 +1,201 @@
+"""
+Time and peak memory of the GIS and calculation hot paths on synthetic plots of increasing size.
+
+For every size a synthetic canopy raster (tiled GeoTIFF, 0/1 canopy mask) and a drip-line network
+(blocks of parallel rows) are generated in a temporary folder, then each step is run --repeat
+times and the best time is kept. Peak memory is measured in one extra run with tracemalloc, which
+sees the NumPy, pandas and Python allocations but not the buffers allocated inside GDAL/GEOS.
+
+Steps:
+    et0_array        calc_etp.calculate_et0_array over 100 values per line
+    buffer           gis.create_irrigation_network_buffer
+    zonal_memory     gis.calculate_mean_pixel_value on the raster already in memory
+    zonal_windowed   gis.calculate_mean_pixel_value_windowed reading the TIF by tiles
+    line_metrics     gis.add_line_metrics and gis.add_dripper_sizing
+    line_maps        the three per-line maps (only up to --max-plot-lines lines)
+    pdf_report       pdf_creator.save_plots_and_create_pdf (only up to --max-plot-lines lines)
+
+Usage:
+    python benchmarks/bench_hot_paths.py [--sizes 100 1000 10000] [--repeat 3] [--resolution 0.25]
+                                         [--save results.json] [--compare baseline.json --tolerance 0.25]
+
+With --compare the run fails when a step is slower than the baseline by more than the tolerance,
+so scaling regressions show up when the suite is run before and after a change.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+import geopandas as gpd
+import matplotlib.pyplot as plt
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from shapely import linestrings
+
+import gis
+import pdf_creator
+from calc_etp import calculate_et0_array
+
+CRS = "EPSG:25829"
+ROWS_PER_BLOCK = 100
+ROW_SPACING = 2.5  # m between drip lines
+LINE_LENGTH = 50.0  # m
+BUFFER_WIDTH = 0.75
+SEED = 1
+
+
+def make_network(n_lines):
+    # Blocks of ROWS_PER_BLOCK parallel rows laid out on a square grid of blocks
+    n_blocks = math.ceil(n_lines / ROWS_PER_BLOCK)
+    blocks_per_side = math.ceil(math.sqrt(n_blocks))
+    line = np.arange(n_lines)
+    block, row = np.divmod(line, ROWS_PER_BLOCK)
+    x0 = 500000 + (block % blocks_per_side) * (LINE_LENGTH + 10)
+    y0 = 4645000 + (block // blocks_per_side) * (ROWS_PER_BLOCK * ROW_SPACING + 10) + row * ROW_SPACING
+    coords = np.stack([np.stack([x0, y0], axis=1), np.stack([x0 + LINE_LENGTH, y0], axis=1)], axis=1)
+    return gpd.GeoDataFrame(geometry=linestrings(coords), crs=CRS)
+
+
+def make_canopy(path, network, resolution):
+    # Canopy mask made of 2 m patches, covering the network plus a margin
+    left, bottom, right, top = network.total_bounds + np.array([-5, -5, 5, 5])
+    width, height = int((right - left) / resolution), int((top - bottom) / resolution)
+    patch = max(1, int(2 / resolution))
+    rng = np.random.default_rng(SEED)
+    coarse = (rng.random((height // patch + 1, width // patch + 1)) > 0.5).astype("float32")
+    data = np.repeat(np.repeat(coarse, patch, axis=0), patch, axis=1)[:height, :width]
+    profile = dict(driver="GTiff", width=width, height=height, count=1, dtype="float32", crs=CRS,
+                   transform=from_origin(left, top, resolution, resolution), nodata=-9999, tiled=True,
+                   blockxsize=256, blockysize=256)
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+    return width * height
+
+
+def weather_arrays(n_values):
+    rng = np.random.default_rng(SEED)
+    tmin = rng.uniform(8, 18, n_values)
+    tmax = tmin + rng.uniform(8, 16, n_values)
+    return (tmax, tmin, (tmax + tmin) / 2, rng.uniform(10, 30, n_values), rng.uniform(30, 80, n_values),
+            rng.uniform(0.5, 4, n_values), 600, 42.3, rng.integers(1, 366, n_values))
+
+
+def build_cases(n_lines, workdir, resolution, max_plot_lines):
+    # Each case is (name, function to time); the network, raster and buffer are prepared here, outside the timing
+    network = make_network(n_lines)
+    tif_path = os.path.join(workdir, f"canopy_{n_lines}.tif")
+    pixels = make_canopy(tif_path, network, resolution)
+    buffer = gis.create_irrigation_network_buffer(network, BUFFER_WIDTH)
+    dem, _, bounds = gis.read_dem(tif_path)
+    gis.calculate_mean_pixel_value_windowed(buffer, tif_path)
+    gis.add_line_metrics(buffer, 2.0, buffer["mean_value"].mean(), 2.0)
+
+    def line_maps():
+        figures = [gis.generate_ideal_liters_per_dripper_map(buffer, show=False),
+                   gis.generate_rounded_ideal_liters_map(buffer, show=False),
+                   gis.generate_overuse_ratio_map(buffer, show=False)]
+        for fig in figures:
+            plt.close(fig)
+        return figures
+
+    def pdf_report():
+        figures = line_maps()
+        overview = gis.read_overview(tif_path)[0]
+        with contextlib.redirect_stdout(io.StringIO()):  # Keep the table readable
+            pdf_creator.save_plots_and_create_pdf(
+                "FAO summary\n", "Irrigation summary\n", os.path.join(SRC_DIR, "images", "kawaii_water_drop.jpg"),
+                overview, network, figures[0], figures[1], os.path.join(workdir, f"report_{n_lines}.pdf"),
+                *figures, overuse_ratio=100.0, assigned_letter="B", interactive=False)
+
+    weather = weather_arrays(n_lines * 100)
+    cases = [
+        ("et0_array", lambda: calculate_et0_array(*weather)),
+        ("buffer", lambda: gis.create_irrigation_network_buffer(network, BUFFER_WIDTH)),
+        ("zonal_memory", lambda: gis.calculate_mean_pixel_value(buffer, dem, bounds)),
+        ("zonal_windowed", lambda: gis.calculate_mean_pixel_value_windowed(buffer, tif_path)),
+        ("line_metrics", lambda: (gis.add_line_metrics(buffer, 2.0, buffer["mean_value"].mean(), 2.0),
+                                  gis.add_dripper_sizing(buffer, 0.75))),
+    ]
+    if n_lines <= max_plot_lines:
+        cases += [("line_maps", line_maps), ("pdf_report", pdf_report)]
+    return cases, pixels
+
+
+def measure(func, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    reference = {(row["size"], row["step"]): row for row in baseline}
+    for row in results:
+        old = reference.get((row["size"], row["step"]))
+        if old and row["seconds"] > old["seconds"] * (1 + tolerance):
+            regressions.append(f"{row['step']} ({row['size']} lines): {old['seconds']:.4f} s -> {row['seconds']:.4f} s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Number of drip lines")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per step (best time is kept)")
+    parser.add_argument("--resolution", type=float, default=0.25, help="Pixel size of the canopy raster (m)")
+    parser.add_argument("--max-plot-lines", type=int, default=1000,
+                        help="Largest network for which the maps and the PDF are benchmarked")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    results = []
+    print(f"{'lines':>8} {'pixels':>12}  {'step':<16}{'time (s)':>10}{'peak (MB)':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_lines in args.sizes:
+            cases, pixels = build_cases(n_lines, workdir, args.resolution, args.max_plot_lines)
+            for step, func in cases:
+                seconds, peak = measure(func, args.repeat)
+                results.append({"size": n_lines, "pixels": pixels, "step": step, "seconds": seconds,
+                                "peak_bytes": peak})
+                print(f"{n_lines:>8} {pixels:>12}  {step:<16}{seconds:>10.4f}{peak / 2 ** 20:>11.1f}")
+            gis.dataset_cache.clear()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Slower than the baseline: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
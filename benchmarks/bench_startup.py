@@ -0,0 +1,76 @@
+"""
+Cold import time of every module in src/.
+
+Each module is imported in a fresh interpreter, several times, and the best time is kept so
+that disk caching noise does not hide regressions. It also checks that importing main.py does
+not load the heavy GIS, PDF and plotting stacks, which are only imported when first used.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--max-main-seconds 1.0]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+MODULES = ("calc_etp", "calc_etc", "current_irrigation_network", "irrigation_network_efficiency", "pipeline",
+           "label_letters", "ratio_label", "diagrams", "dataset_cache", "zonal", "gis", "pdf_creator", "results_export",
+           "water_balance", "uncertainty", "optimizer", "hydraulics", "network_topology", "scheduler",
+           "canopy_series", "line_segments", "headless", "batch", "main")
+HEAVY_MODULES = ("matplotlib", "networkx", "rasterio", "geopandas", "shapely", "reportlab")
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(heavy))
+"""
+
+
+def time_import(module, repeat):
+    best, heavy = None, ""
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=SRC_DIR, capture_output=True, text=True, check=True
+        ).stdout.split()
+        elapsed = float(output[0])
+        heavy = output[1] if len(output) > 1 else ""
+        best = elapsed if best is None else min(best, elapsed)
+    return best, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (best time is kept)")
+    parser.add_argument("--max-main-seconds", type=float, default=None,
+                        help="Fail if importing main takes longer than this")
+    args = parser.parse_args(argv)
+
+    print(f"{'module':<32}{'import (s)':>12}  heavy modules loaded")
+    failed = False
+    for module in MODULES:
+        try:
+            elapsed, heavy = time_import(module, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<32}{'error':>12}  {e.stderr.strip().splitlines()[-1]}")
+            failed = True
+            continue
+        print(f"{module:<32}{elapsed:>12.3f}  {heavy or '-'}")
+
+        if module == "main":
+            if heavy:
+                print(f"  main loads {heavy} at import time; these must be imported lazily")
+                failed = True
+            if args.max_main_seconds is not None and elapsed > args.max_main_seconds:
+                print(f"  main takes {elapsed:.3f} s to import (limit {args.max_main_seconds:.3f} s)")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
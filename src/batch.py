@@ -0,0 +1,219 @@
+"""
+Batch mode: label many plots in parallel from a manifest.
+
+Usage:
+    python batch.py manifest.toml --output-dir campaign [--workers 4]
+
+The manifest is a JSON, TOML or YAML file with optional [defaults] (the same sections as a
+headless job file) and a list of plots. Each plot has a unique name plus the sections that
+differ from the defaults. The name is used as the plot folder, so it cannot contain path
+separators or be "..". Example (TOML):
+
+    [defaults.crop]
+    kc = 0.7
+    eto_percentage = 0.3
+
+    [defaults.dripper]
+    flow = 2.0
+    spacing = 0.75
+    irrigation_width = 1.5
+
+    [defaults.irrigation]
+    turn = 7
+    hours = 8
+    efficiency = 0.9
+
+    [defaults.et0]
+    value = 6.5
+
+    [[plots]]
+    name = "block-01"
+    canopy = { tif_path = "block-01/canopy.tif", vector_path = "block-01/network.shp" }
+
+    [[plots]]
+    name = "block-02"
+    canopy = { cc = 0.45 }
+    dripper = { flow = 1.6 }
+
+Every plot is written to <output-dir>/<name>/ (summary, figures, label and PDF) and a row is
+appended to <output-dir>/batch_results.csv as soon as the plot finishes. A failing plot is
+reported and recorded in the CSV without stopping the others.
+
+With --results-format parquet (or csv) every plot also gets its plot_results and line_results
+tables (see results_export.py), tagged with the plot name, and the batch summary is written to
+<output-dir>/batch_results.parquet as well.
+
+With --streaming, the plots that measure the canopy from the GIS layers read their networks in
+chunks of lines (see gis.iter_line_statistics), as with streaming = true in the [canopy] section of
+a job; no maps are drawn for them. The line tables of a campaign can then be read as one
+dataset, e.g. pandas.read_parquet(glob.glob("campaign/*/line_results.parquet")).
+"""
+import argparse
+import copy
+import csv
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import headless
+
+RESULT_FIELDS = ("name", "status", "assigned_letter", "overuse_ratio", "et0", "etc", "fc", "liters_per_dripper",
+                 "dripper_flow", "pdf_path", "error")
+
+
+def _merge_sections(defaults, overrides):
+    job = copy.deepcopy(defaults)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(job.get(key), dict):
+            job[key].update(value)
+        else:
+            job[key] = value
+    return job
+
+
+def check_plot_name(name):
+    # The name becomes the plot folder under the output directory, so it must be a single plain folder name
+    if (not isinstance(name, str) or name in (".", "..") or "/" in name or "\\" in name
+            or os.path.isabs(name) or os.path.splitdrive(name)[0]):
+        raise ValueError(f"Invalid plot name in the manifest: {name!r} (use a folder name without path separators)")
+
+
+def load_manifest(manifest_path):
+    """Return the list of plot jobs of a manifest, with the defaults applied."""
+    manifest = headless.read_config_file(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    defaults = manifest.get("defaults", {})
+
+    jobs = []
+    names = set()
+    for plot in manifest.get("plots", []):
+        name = plot.get("name")
+        if not name:
+            raise ValueError("Every plot in the manifest needs a 'name'")
+        check_plot_name(name)
+        if name in names:
+            raise ValueError(f"Duplicated plot name in the manifest: {name}")
+        names.add(name)
+
+        job = _merge_sections(defaults, plot)
+        headless.validate_job(job)
+        job["base_dir"] = base_dir
+        job.setdefault("output", {})
+        job["output"].setdefault("pdf", f"{name}.pdf")
+        jobs.append(job)
+
+    if not jobs:
+        raise ValueError(f"The manifest {manifest_path} does not contain any plot")
+    return jobs
+
+
+def run_plot(job, output_dir):
+    """Run one plot; errors are returned instead of raised so one bad plot does not stop the batch."""
+    name = job["name"]
+    plot_dir = os.path.join(output_dir, name)
+    try:
+        results = headless.run_job(job, plot_dir)
+    except Exception as e:
+        return {"name": name, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc()}
+
+    row = {field: results.get(field) for field in RESULT_FIELDS}
+    row.update({"name": name, "status": "ok", "error": ""})
+    return row
+
+
+def set_results_format(jobs, result_format):
+    """Ask every job for its plot_results and line_results tables in result_format."""
+    for job in jobs:
+        job.setdefault("output", {})["results"] = result_format
+    return jobs
+
+
+def set_streaming(jobs, chunk_size=None):
+    """Measure the canopy of every job with the streaming line statistics."""
+    for job in jobs:
+        canopy = job.setdefault("canopy", {})
+        canopy["streaming"] = True
+        if chunk_size:
+            canopy["chunk_size"] = chunk_size
+    return jobs
+
+
+def run_batch(jobs, output_dir, max_workers=None, progress=print):
+    """Process the plots in a process pool, yielding each result as soon as it is available."""
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_plot, job, output_dir): job["name"] for job in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                row = future.result()
+            except Exception as e:  # The worker process itself died
+                row = {"name": futures[future], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+            if progress:
+                if row["status"] == "ok":
+                    progress(f"[{done}/{len(jobs)}] {row['name']}: {row['assigned_letter']} "
+                             f"(overuse ratio {row['overuse_ratio']:.2f})")
+                else:
+                    progress(f"[{done}/{len(jobs)}] {row['name']}: FAILED - {row['error']}")
+            yield row
+
+
+def write_batch_results(rows, csv_path):
+    """Stream the rows to a CSV file, flushing after every plot, and return them."""
+    written = []
+    with open(csv_path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            file.flush()
+            written.append(row)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Label many plots in parallel from a manifest file.")
+    parser.add_argument("manifest", help="Manifest file (.json, .toml, .yaml)")
+    parser.add_argument("--output-dir", required=True, help="Folder where every plot gets its own sub-folder")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--results-format", choices=("parquet", "csv"), default=None,
+                        help="Also write per-plot and per-line result tables in this format")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Read the irrigation networks in chunks of lines (for networks too large for memory)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Lines per chunk with --streaming (default: 10000)")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest)
+        if args.results_format:
+            import results_export
+            results_export.check_results_format(args.results_format)
+            set_results_format(jobs, args.results_format)
+        if args.streaming:
+            set_streaming(jobs, args.chunk_size)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    csv_path = os.path.join(args.output_dir, "batch_results.csv")
+    rows = write_batch_results(run_batch(jobs, args.output_dir, args.workers), csv_path)
+    if args.results_format == "parquet":
+        import pandas as pd
+        results_export.write_table(pd.DataFrame(rows, columns=RESULT_FIELDS),
+                                   os.path.join(args.output_dir, "batch_results.parquet"))
+
+    failed = [row for row in rows if row["status"] != "ok"]
+    print(f"{len(rows) - len(failed)} plot(s) labelled, {len(failed)} failed. Results: {csv_path}")
+    for row in failed:
+        if row.get("traceback"):
+            print(f"\n{row['name']}:\n{row['traceback']}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
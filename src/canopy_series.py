@@ -0,0 +1,188 @@
+"""
+Canopy Cover of every irrigation line over a season of drone flights (a stack of canopy rasters).
+
+All the rasters of a stack must share the same grid (size, transform and CRS), either as several
+single-band TIFs (one per flight) or as the bands of one TIF. The buffers of the lines are then
+rasterized only once into a zone index: for every raster tile, the pixels of every line buffer
+(with their weight when overlap='split'). The index is saved next to the network layer as .npy
+files plus a JSON key (network file signature, buffer width, overlap, tile size and grid); a later
+run with the same key opens the index memory-mapped instead of rasterizing again.
+
+With the index, every tile of every date is read once and the statistics of all lines and all
+dates come out of a single bincount per tile, giving a lines x dates table of Canopy Cover.
+"""
+import json
+import os
+
+import numpy as np
+import rasterio
+import rasterio.windows
+
+from dataset_cache import file_signature
+from zonal import (
+    assign_non_overlapping_layers,
+    check_overlap_mode,
+    finalize_zone_sums,
+    iter_tile_windows,
+    match_tiles_to_geometries,
+    window_zone_pixels
+)
+
+ZONE_INDEX_ARRAYS = ("pixels", "labels", "weights", "windows", "offsets")
+
+
+def read_stack_grid(tif_paths):
+    """Grid of the stack (width, height, transform, CRS) and its dates as (path, band) pairs."""
+    grid, bands = None, []
+    for path in tif_paths:
+        with rasterio.open(path) as src:
+            src_grid = {"width": src.width, "height": src.height, "transform": list(src.transform)[:6],
+                        "crs": src.crs.to_string() if src.crs else None}
+            if grid is None:
+                grid = src_grid
+            elif src_grid != grid:
+                raise ValueError(f"{path} is not on the same grid as {tif_paths[0]}; resample the stack first")
+            bands.extend((path, band) for band in range(1, src.count + 1))
+    if grid is None:
+        raise ValueError("The canopy stack needs at least one raster")
+    return grid, bands
+
+
+def zone_index_paths(vector_path, cache_dir=None):
+    # <network>.zones.json plus one .npy file per array, next to the network layer by default
+    stem = os.path.splitext(os.path.basename(vector_path))[0]
+    base = os.path.join(cache_dir or os.path.dirname(os.path.abspath(vector_path)), f"{stem}.zones")
+    paths = {name: f"{base}.{name}.npy" for name in ZONE_INDEX_ARRAYS}
+    paths["key"] = f"{base}.json"
+    return paths
+
+
+def build_zone_index(geometries, template_path, tile_size=2048, overlap='shared'):
+    """
+    Pixels (flat index in their tile), zone labels and weights of every buffer, grouped by tile and
+    sorted by zone within every tile.
+    """
+    check_overlap_mode(overlap)
+    geometries = np.asarray(geometries, dtype=object)
+    layers = assign_non_overlapping_layers(geometries) if overlap != 'first' else None
+    pixels, labels, weights, windows, offsets = [], [], [], [], [0]
+    with rasterio.open(template_path) as src:
+        tiles = list(iter_tile_windows(src, tile_size))
+        for tile, idx in match_tiles_to_geometries(geometries, tiles, src.transform).items():
+            window = tiles[tile]
+            shape = (int(window.height), int(window.width))
+            tile_pixels, tile_labels, tile_weights = window_zone_pixels(geometries, idx, layers, shape,
+                                                                        src.window_transform(window), overlap)
+            # Sorted by zone, so the pixels of every zone are contiguous and can be summed with reduceat
+            order = np.argsort(tile_labels, kind='stable')
+            pixels.append(tile_pixels[order])
+            labels.append(tile_labels[order].astype(np.int32))
+            weights.append(tile_weights[order] if tile_weights is not None else np.ones(0))
+            windows.append((int(window.col_off), int(window.row_off), shape[1], shape[0]))
+            offsets.append(offsets[-1] + len(tile_pixels))
+    return {
+        "pixels": np.concatenate(pixels) if pixels else np.empty(0, dtype=np.int64),
+        "labels": np.concatenate(labels) if labels else np.empty(0, dtype=np.int32),
+        "weights": np.concatenate(weights).astype(np.float32) if overlap == 'split' and weights else np.empty(0),
+        "windows": np.array(windows, dtype=np.int64).reshape(-1, 4),
+        "offsets": np.array(offsets, dtype=np.int64),
+    }
+
+
+def save_zone_index(index, key, paths):
+    os.makedirs(os.path.dirname(paths["key"]), exist_ok=True)
+    for name in ZONE_INDEX_ARRAYS:
+        np.save(paths[name], index[name])
+    # The key is written last, so an interrupted save is never taken for a valid index
+    with open(paths["key"], "w", encoding="utf-8") as file:
+        json.dump(key, file)
+
+
+def load_zone_index(key, paths):
+    # Saved index opened memory-mapped, or None when it is missing or was built for other inputs
+    try:
+        with open(paths["key"], "r", encoding="utf-8") as file:
+            if json.load(file) != key:
+                return None
+        return {name: np.load(paths[name], mmap_mode="r") for name in ZONE_INDEX_ARRAYS}
+    except (OSError, ValueError):
+        return None
+
+
+def get_zone_index(vector_path, geometries, tif_paths, buffer_width, tile_size=2048, overlap='shared',
+                   cache_dir=None):
+    """
+    Zone index of the line buffers over the grid of the stack, from the cache next to the network
+    (or in cache_dir) when it matches. geometries is only rasterized when the index has to be built;
+    if the cache cannot be written, the index built in memory is used.
+    """
+    grid, _ = read_stack_grid(tif_paths)
+    key = {"network": [list(part) for part in file_signature(vector_path)], "lines": len(geometries),
+           "buffer_width": buffer_width, "overlap": overlap, "tile_size": tile_size, "grid": grid}
+    paths = zone_index_paths(vector_path, cache_dir)
+    index = load_zone_index(key, paths)
+    if index is None:
+        index = build_zone_index(geometries, tif_paths[0], tile_size, overlap)
+        try:
+            save_zone_index(index, key, paths)
+        except OSError:
+            # The index is only a cache: a read-only data folder just means it is built again next run
+            pass
+    return index
+
+
+def calculate_stack_statistics(index, tif_paths, n_zones, overlap='shared'):
+    """
+    Mean, pixel count and standard deviation of every zone for every date of the stack, as arrays
+    of shape (zones, dates). Pixels with negative or NaN values (outside the mask) are ignored.
+    """
+    _, bands = read_stack_grid(tif_paths)
+    # Row 0 collects nothing but keeps the layout of zonal.empty_zone_sums (row = zone label)
+    sums = {key: np.zeros((n_zones + 1, len(bands))) for key in ("count", "sum", "sum_sq")}
+    datasets = {path: rasterio.open(path) for path in dict.fromkeys(path for path, _ in bands)}
+    try:
+        for tile, (col_off, row_off, width, height) in enumerate(np.asarray(index["windows"])):
+            start, end = index["offsets"][tile], index["offsets"][tile + 1]
+            if start == end:
+                continue
+            window = rasterio.windows.Window(col_off, row_off, width, height)
+            pixels = np.asarray(index["pixels"][start:end])
+            labels = np.asarray(index["labels"][start:end])
+            values = np.stack([datasets[path].read(band, window=window).ravel()[pixels] for path, band in bands])
+
+            # Every date at once: the pixels of a zone are contiguous, so each sum is a reduceat over the runs
+            runs = np.flatnonzero(np.concatenate(([True], labels[1:] != labels[:-1])))
+            weights = (values >= 0).astype(np.float64)  # Ignore values outside the mask
+            if overlap == 'split':
+                weights *= np.asarray(index["weights"][start:end])
+            # NaN nodata fails values >= 0 too, and is zeroed so it never reaches the sums
+            valid_values = np.where(values >= 0, values, 0)
+            weighted_values = weights * valid_values
+            zones = labels[runs]
+            sums["count"][zones] += np.add.reduceat(weights, runs, axis=1).T
+            sums["sum"][zones] += np.add.reduceat(weighted_values, runs, axis=1).T
+            sums["sum_sq"][zones] += np.add.reduceat(weighted_values * valid_values, runs, axis=1).T
+    finally:
+        for src in datasets.values():
+            src.close()
+
+    return finalize_zone_sums(sums, overlap)
+
+
+def date_labels(tif_paths, dates=None):
+    # Column name of every date: the given dates, or the file name (plus the band for multi-band TIFs)
+    _, bands = read_stack_grid(tif_paths)
+    if dates is not None:
+        if len(dates) != len(bands):
+            raise ValueError(f"{len(dates)} dates given for a stack of {len(bands)} rasters")
+        return [str(date) for date in dates]
+    multiband = len(bands) > len(tif_paths)
+    return [os.path.splitext(os.path.basename(path))[0] + (f"_b{band}" if multiband else "") for path, band in bands]
+
+
+def format_canopy_series_summary(series):
+    lines = [f"Canopy Cover of {len(series)} lines on {len(series.columns)} dates (mean / min / max of the lines):"]
+    for date in series.columns:
+        values = series[date]
+        lines.append(f"{date}: {values.mean():.3f} / {values.min():.3f} / {values.max():.3f}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,108 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Files that belong to a shapefile: a change in any of them must invalidate the cached layer
+SHAPEFILE_SIDECARS = (".shx", ".dbf", ".prj", ".cpg")
+# Memory the cached datasets may take together (a full-resolution canopy mosaic can be several GB)
+DEFAULT_MAX_BYTES = 1 << 30
+
+
+def file_signature(path):
+    """Path plus modification time and size of the file (and of its shapefile sidecars)."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = [(path, stat.st_mtime_ns, stat.st_size)]
+    stem, extension = os.path.splitext(path)
+    if extension.lower() == ".shp":
+        for sidecar in SHAPEFILE_SIDECARS:
+            if os.path.exists(stem + sidecar):
+                sidecar_stat = os.stat(stem + sidecar)
+                signature.append((sidecar, sidecar_stat.st_mtime_ns, sidecar_stat.st_size))
+    return tuple(signature)
+
+
+def estimate_nbytes(value):
+    """Approximate memory of a cached value: arrays, (Geo)DataFrames and tuples or lists of them."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(item) for item in value)
+    if hasattr(value, "memory_usage"):  # pandas and geopandas tables
+        nbytes = int(value.memory_usage(index=True, deep=True).sum())
+        geometry = getattr(value, "geometry", None)
+        if geometry is not None:
+            # The coordinates live in GEOS, outside the memory pandas can see
+            import shapely
+            nbytes += int(shapely.get_num_coordinates(geometry.values).sum()) * 16
+        return nbytes
+    return sys.getsizeof(value)
+
+
+class DatasetCache:
+    """
+    Least-recently-used cache of decoded rasters and vector layers.
+
+    Entries are keyed by the loader, its arguments and the file signature (path, mtime and size),
+    so a file that changes on disk is read again; the entries of its older versions are dropped at
+    that point. The least recently used datasets are evicted once the cached values take more than
+    max_bytes, and a value larger than max_bytes is returned without being cached.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _pop(self, key):
+        del self._entries[key]
+        self.nbytes -= self._sizes.pop(key)
+
+    def get(self, loader, path, *args):
+        signature = file_signature(path)
+        key = (loader.__module__, loader.__qualname__, signature, args)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = loader(path, *args)
+        nbytes = estimate_nbytes(value)
+
+        with self._lock:
+            self.misses += 1
+            # Older versions of the same file will never be asked for again
+            for stale in [cached for cached in self._entries
+                          if cached[2][0][0] == signature[0][0] and cached[2] != signature]:
+                self._pop(stale)
+            if nbytes > self.max_bytes or key in self._entries:
+                return value
+            self._entries[key] = value
+            self._sizes[key] = nbytes
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by every stage of a run (and by consecutive runs of a batch worker)
+dataset_cache = DatasetCache()
@@ -2,12 +2,25 @@ import rasterio
 import numpy as np
 import matplotlib.pyplot as plt
 import geopandas as gpd
+import pandas as pd
+import pyogrio
+import shapely
 from shapely.geometry import LineString
 from tkinter import Tk, filedialog, simpledialog, messagebox
 import rasterio.features
-from irrigation_network_efficiency import calculate_ideal_liters_per_dripper, calculate_overuse_ratio
+from dataset_cache import dataset_cache
+from zonal import calculate_zonal_statistics, calculate_zonal_statistics_from_file
+from irrigation_network_efficiency import (
+    DRIPPER_CATALOG,
+    calculate_line_metrics,
+    calculate_overuse_ratio,
+    size_drippers
+)
 import matplotlib.colors as mcolors
-import math
+from rasterio.enums import Resampling
+
+# Canopy previews are read at about the resolution of a 10x8 inch figure at 100 DPI
+PREVIEW_MAX_SIZE = 1024
 
 def request_tif_path():
     root = Tk()
@@ -24,45 +37,95 @@ def request_vector_path():
     root.withdraw()
     root.attributes("-topmost", True)
     messagebox.showinfo("Select File", "Please select the vector layer of the irrigation network.")
-    vector_path = filedialog.askopenfilename(filetypes=[("SHP Files", "*.shp"), ("All files", "*.*")])
+    vector_path = filedialog.askopenfilename(filetypes=[("Vector Files", "*.shp *.gpkg *.fgb"), ("SHP Files", "*.shp"),
+                                                        ("GeoPackage", "*.gpkg"), ("FlatGeobuf", "*.fgb"),
+                                                        ("All files", "*.*")])
     root.destroy()
     return vector_path
 
-def read_dem(tif_path):
+def _load_dem(tif_path):
     with rasterio.open(tif_path) as src:
         dem = src.read(1)  # Read the first band
         profile = src.profile
         bounds = src.bounds
+    dem.setflags(write=False)  # Shared through the dataset cache
     return dem, profile, bounds
 
-def read_vector_layer(vector_path):
-    return gpd.read_file(vector_path)
+def read_dem(tif_path):
+    return dataset_cache.get(_load_dem, tif_path)
 
-def show_tif_image(dem, bounds):
+def _load_overview(tif_path, max_size):
+    with rasterio.open(tif_path) as src:
+        factor = max(1.0, max(src.width, src.height) / max_size)
+        out_shape = (max(1, round(src.height / factor)), max(1, round(src.width / factor)))
+        overview = src.read(1, out_shape=out_shape, resampling=Resampling.average, out_dtype='float32')
+        bounds = src.bounds
+    overview.setflags(write=False)  # Shared by every figure of the run
+    return overview, bounds
+
+def read_overview(tif_path, max_size=PREVIEW_MAX_SIZE):
+    # Decimated copy of the first band for the figures, no larger than max_size pixels on its longest side.
+    # GDAL uses the internal overviews of the TIF when they exist, and the result is cached for the whole run
+    return dataset_cache.get(_load_overview, tif_path, max_size)
+
+def read_vector_layer(vector_path):
+    # The decoded layer is cached; callers get their own copy because some of them add columns
+    return dataset_cache.get(gpd.read_file, vector_path).copy()
+
+def read_vector_layer_chunks(vector_path, chunk_size=10000, bbox=None):
+    # Stream the layer in chunks of chunk_size features (optionally only those inside bbox) instead of
+    # loading it whole. The index holds the feature ids of the file, so chunks can be joined back later
+    start = 0
+    while True:
+        chunk = pyogrio.read_dataframe(vector_path, skip_features=start, max_features=chunk_size, bbox=bbox,
+                                       fid_as_index=True)
+        if len(chunk) == 0:
+            break
+        yield chunk
+        start += len(chunk)
+
+def convert_vector_layer(vector_path, output_path, chunk_size=10000):
+    # Copy a layer (e.g. a large SHP) to GeoPackage (.gpkg) or FlatGeobuf (.fgb), which read faster.
+    # GeoPackage is written chunk by chunk; FlatGeobuf cannot be appended to, so it is written in one go
+    chunks = read_vector_layer_chunks(vector_path, chunk_size)
+    if output_path.lower().endswith('.gpkg'):
+        for i, chunk in enumerate(chunks):
+            pyogrio.write_dataframe(chunk, output_path, append=i > 0)
+    else:
+        pyogrio.write_dataframe(pd.concat(chunks), output_path)
+    return output_path
+
+def show_tif_image(dem, bounds, show=True):
     fig, ax = plt.subplots(figsize=(10, 8))
     im = ax.imshow(dem, cmap='viridis', vmin=0, vmax=1, extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
     plt.colorbar(im, label='Elevation', ticks=[0, 1], ax=ax)
     ax.set_title('Canopy Height Model (CHM)')
     ax.set_xlabel('Columns')
     ax.set_ylabel('Rows')
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)  # Close the figure after displaying it
+    return fig
 
-def show_vector_layer(vector_layer, title):
+def show_vector_layer(vector_layer, title, show=True):
     fig, ax = plt.subplots(figsize=(10, 8))
     vector_layer.plot(ax=ax, color='orange')
     ax.set_title(title)
     ax.set_xlabel('Longitude')
     ax.set_ylabel('Latitude')
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)  # Close the figure after displaying it
+    return fig
 
 def create_irrigation_network_buffer(vector_layer, width):
-    buffer = vector_layer.copy()
-    buffer['geometry'] = buffer.geometry.apply(lambda geom: geom.buffer(width, cap_style=2))
+    # Vectorized buffer with flat ends; the result is a new layer and the input lines are left untouched.
+    # The length of each line is kept, since it is lost once the line becomes a polygon
+    buffer = vector_layer.set_geometry(vector_layer.geometry.buffer(width, cap_style='flat'))
+    buffer['length'] = vector_layer.geometry.length.to_numpy()
     return buffer
 
-def show_buffer_outline(dem, bounds, buffer, irrigation_width):
+def show_buffer_outline(dem, bounds, buffer, irrigation_width, show=True):
     fig, ax = plt.subplots(figsize=(10, 8))
     im = ax.imshow(dem, cmap='viridis', vmin=0, vmax=1, alpha=0.7,
                     extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
@@ -78,14 +141,16 @@ def show_buffer_outline(dem, bounds, buffer, irrigation_width):
              color='white',
              fontsize=12,
              bbox=dict(facecolor='black', alpha=0.5))
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)  # Close the figure after displaying it
+    return fig
 
 def calculate_lengths(vector_layer):
     vector_layer['length'] = vector_layer.geometry.length
     return vector_layer
 
-def show_irrigation_network_with_lengths(dem, bounds, vector_layer):
+def show_irrigation_network_with_lengths(dem, bounds, vector_layer, show=True):
     fig, ax = plt.subplots(figsize=(10, 8))
     im = ax.imshow(dem, cmap='viridis', vmin=0, vmax=1, alpha=0.7,
                     extent=[bounds.left, bounds.right, bounds.bottom, bounds.top])
@@ -99,24 +164,91 @@ def show_irrigation_network_with_lengths(dem, bounds, vector_layer):
     ax.set_title('Irrigation Network with Lengths and CHM')
     ax.set_xlabel('Longitude')
     ax.set_ylabel('Latitude')
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)  # Close the figure after displaying it
+    return fig
 
-def calculate_mean_pixel_value(buffer, dem, bounds):
-    buffer['mean_value'] = 0.0
+def calculate_mean_pixel_value(buffer, dem, bounds, overlap='shared'):
     transform = rasterio.transform.from_bounds(bounds.left, bounds.bottom, bounds.right, bounds.top, dem.shape[1],
                                                dem.shape[0])
 
-    for idx, row in buffer.iterrows():
-        geom = row.geometry
-        mask = rasterio.features.geometry_mask([geom], transform=transform, invert=True, out_shape=dem.shape)
-        masked_dem = dem[mask]
-        mean_value = np.mean(masked_dem[masked_dem >= 0])  # Ignore values outside the mask
-        buffer.at[idx, 'mean_value'] = mean_value
+    # Rasterize all buffers once and compute every line's statistics in a single pass
+    stats = calculate_zonal_statistics(buffer.geometry.values, dem, transform, overlap=overlap)
+    buffer['mean_value'] = stats['mean']
+    buffer['pixel_count'] = stats['count']
+    buffer['std_value'] = stats['std']
 
     return buffer
 
-def show_irrigation_network_with_values(dem, bounds, buffer):
+def calculate_mean_pixel_value_windowed(buffer, tif_path, tile_size=2048, overlap='shared'):
+    # Same result as calculate_mean_pixel_value, reading only the raster tiles that intersect the buffers
+    stats = calculate_zonal_statistics_from_file(buffer.geometry.values, tif_path, tile_size=tile_size, overlap=overlap)
+    buffer['mean_value'] = stats['mean']
+    buffer['pixel_count'] = stats['count']
+    buffer['std_value'] = stats['std']
+
+    return buffer
+
+def _overlapping_neighbours(vector_path, lines, buffers, buffer_width):
+    # Lines of other chunks whose buffers overlap the buffers of this chunk, read with a bbox query around
+    # the chunk, so 'first' and 'split' see every buffer covering a pixel as in the whole-network pass
+    minx, miny, maxx, maxy = shapely.total_bounds(buffers)
+    nearby = pyogrio.read_dataframe(vector_path, bbox=(minx - buffer_width, miny - buffer_width,
+                                                       maxx + buffer_width, maxy + buffer_width), fid_as_index=True)
+    nearby = nearby[~nearby.index.isin(lines.index)]
+    nearby_buffers = nearby.geometry.buffer(buffer_width, cap_style='flat').values
+    overlapping = np.unique(shapely.STRtree(nearby_buffers).query(buffers, predicate='intersects')[1])
+    return nearby.iloc[overlapping], nearby_buffers[overlapping]
+
+def iter_line_statistics(vector_path, tif_path, buffer_width, chunk_size=10000, bbox=None, tile_size=2048,
+                         overlap='shared', liters_per_dripper=None, avg_fc=None, actual_flow=None):
+    # Buffer, measure and score the lines in batches of chunk_size, so only one chunk of geometries is in
+    # memory at a time. Yields plain DataFrames (length, mean_value, pixel_count, std_value) indexed by
+    # feature id, plus ideal_liters, rounded_ideal_liters and overuse_ratio when liters_per_dripper, avg_fc
+    # and actual_flow are given. With overlap 'first' or 'split', the buffers of other chunks that overlap
+    # the chunk are measured with it (and dropped afterwards), so the result does not depend on chunk_size
+    score = liters_per_dripper is not None
+    if score and (avg_fc is None or actual_flow is None):
+        raise ValueError("The line metrics need liters_per_dripper, avg_fc and actual_flow")
+    for lines in read_vector_layer_chunks(vector_path, chunk_size, bbox):
+        buffers = lines.geometry.buffer(buffer_width, cap_style='flat').values
+        zones, position = buffers, np.arange(len(lines))
+        if overlap != 'shared' and len(lines):
+            nearby, nearby_buffers = _overlapping_neighbours(vector_path, lines, buffers, buffer_width)
+            # Feature order decides which line keeps a pixel with 'first', as in the whole-network pass
+            fids = np.concatenate([lines.index.to_numpy(), nearby.index.to_numpy()])
+            order = np.argsort(fids, kind='stable')
+            zones = np.concatenate([buffers, nearby_buffers])[order]
+            position = np.argsort(order)[:len(lines)]
+        stats = calculate_zonal_statistics_from_file(zones, tif_path, tile_size=tile_size, overlap=overlap)
+        chunk = pd.DataFrame({
+            'length': lines.geometry.length.to_numpy(),
+            'mean_value': stats['mean'][position],
+            'pixel_count': stats['count'][position],
+            'std_value': stats['std'][position],
+        }, index=lines.index)
+        if score:
+            chunk = chunk.assign(**calculate_line_metrics(chunk['mean_value'].to_numpy(), liters_per_dripper, avg_fc,
+                                                          actual_flow))
+        yield chunk
+
+def calculate_line_statistics_streaming(vector_path, tif_path, buffer_width, chunk_size=10000, bbox=None,
+                                        tile_size=2048, overlap='shared', liters_per_dripper=None, avg_fc=None,
+                                        actual_flow=None):
+    # Per-line table of the whole network from iter_line_statistics. Without avg_fc, the line metrics are
+    # computed at the end with the mean Canopy Cover of all the lines (the coverage factor of the plot)
+    score_chunks = liters_per_dripper is not None and avg_fc is not None
+    chunks = list(iter_line_statistics(vector_path, tif_path, buffer_width, chunk_size, bbox, tile_size, overlap,
+                                       *((liters_per_dripper, avg_fc, actual_flow) if score_chunks else ())))
+    if not chunks:
+        return pd.DataFrame(columns=['length', 'mean_value', 'pixel_count', 'std_value'])
+    lines = pd.concat(chunks)
+    if liters_per_dripper is not None and not score_chunks:
+        lines = add_line_metrics(lines, liters_per_dripper, lines['mean_value'].mean(), actual_flow)
+    return lines
+
+def show_irrigation_network_with_values(dem, bounds, buffer, show=True):
     fig, ax = plt.subplots(figsize=(10, 8))
 
     # Display the CHM (Canopy Height Model) underneath
@@ -134,118 +266,196 @@ def show_irrigation_network_with_values(dem, bounds, buffer):
     ax.set_title('Average Coverage Factor per Irrigation Line')
     ax.set_xlabel('Longitude')
     ax.set_ylabel('Latitude')
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)  # Close the figure after displaying it
+    return fig
+
+def create_segment_buffer(vector_layer, width, segment_length):
+    # Buffers of the segments of segment_length meters of every line (see line_segments.py), with the id of
+    # their line in vector_layer, their number along the line, their start distance and their length.
+    # Also returns the line table the segments were numbered with
+    import line_segments
+    table = line_segments.build_line_table(vector_layer.geometry.values, segment_length)
+    pieces = line_segments.split_lines(table)
+    lines = gpd.GeoSeries(pieces['geometry'], crs=vector_layer.crs)
+    segments = gpd.GeoDataFrame({
+        'line_id': vector_layer.index.to_numpy()[pieces['line']],
+        'segment': pieces['segment'],
+        'start': pieces['start'],
+        'length': lines.length.to_numpy(),
+    }, geometry=lines.buffer(width, cap_style='flat'), crs=vector_layer.crs)
+    return segments, table
+
+def calculate_segment_statistics(tif_path, vector_path, buffer_width, segment_length, tile_size=2048,
+                                 overlap='shared'):
+    # Canopy Cover of every segment of every line, reading the canopy TIF by tiles. Only the line buffers
+    # are rasterized; their pixels are then shared out between the segments
+    import line_segments
+    vector_layer = read_vector_layer(vector_path)
+    segments, table = create_segment_buffer(vector_layer, buffer_width, segment_length)
+    line_buffers = vector_layer.geometry.buffer(buffer_width, cap_style='flat').values
+    stats = line_segments.calculate_segment_statistics(line_buffers, table, tif_path, tile_size, overlap)
+    segments['mean_value'] = stats['mean']
+    segments['pixel_count'] = stats['count']
+    segments['std_value'] = stats['std']
+    return segments
+
+def calculate_canopy_series(vector_path, tif_paths, buffer_width, dates=None, overlap='shared', tile_size=2048,
+                            cache_dir=None):
+    # Canopy Cover of every line on every date of a stack of canopy rasters on the same grid (see
+    # canopy_series.py). The buffers are rasterized once; later runs reuse the zone index saved next to
+    # the network (or in cache_dir). Returns a DataFrame with one row per line and one column per date
+    import canopy_series
+    buffer = create_irrigation_network_buffer(read_vector_layer(vector_path), buffer_width)
+    index = canopy_series.get_zone_index(vector_path, buffer.geometry.values, tif_paths, buffer_width, tile_size,
+                                         overlap, cache_dir)
+    stats = canopy_series.calculate_stack_statistics(index, tif_paths, len(buffer), overlap)
+    return pd.DataFrame(stats['mean'], index=buffer.index, columns=canopy_series.date_labels(tif_paths, dates))
+
+def calculate_coverage_factor(tif_path, vector_path, buffer_width, show=True, plot=True, overlap='shared'):
+    # The figures use a decimated overview; the coverage factor is computed from the full-resolution raster.
+    # With plot=False no figure is created at all
+    vector_layer = read_vector_layer(vector_path)
+    buffer = create_irrigation_network_buffer(vector_layer, buffer_width)
+    buffer = calculate_mean_pixel_value_windowed(buffer, tif_path, overlap=overlap)
+    coverage_factor = buffer['mean_value'].mean()  # Calculate the average coverage factor
+
+    figures = {}
+    if plot:
+        dem, bounds = read_overview(tif_path)
+        figures['canopy'] = show_tif_image(dem, bounds, show=show)
+        figures['network'] = show_vector_layer(vector_layer, 'Irrigation Network', show=show)
+        figures['buffer'] = show_buffer_outline(dem, bounds, buffer, buffer_width * 2, show=show)
+        figures['coverage'] = show_irrigation_network_with_values(dem, bounds, buffer, show=show)
+
+    return coverage_factor, buffer, figures
 
 def obtain_coverage_factor_and_create_buffer(buffer_width):
     tif_path = request_tif_path()
     if not tif_path:
         messagebox.showerror("Error", "No file was selected.")
-        return None, None, None
+        return None, None, None, None
 
     vector_path = request_vector_path()
     if not vector_path:
         messagebox.showerror("Error", "No vector file was selected.")
-        return None, None, None
-
-    dem, profile, bounds = read_dem(tif_path)
-    vector_layer = read_vector_layer(vector_path)
+        return None, None, None, None
 
-    show_tif_image(dem, bounds)
-    show_vector_layer(vector_layer, 'Irrigation Network')
-
-    buffer = create_irrigation_network_buffer(vector_layer, buffer_width)
-    show_buffer_outline(dem, bounds, buffer, buffer_width * 2)
-
-    buffer = calculate_mean_pixel_value(buffer, dem, bounds)
-    show_irrigation_network_with_values(dem, bounds, buffer)
-
-    coverage_factor = buffer['mean_value'].mean()  # Calculate the average coverage factor
+    coverage_factor, buffer, _ = calculate_coverage_factor(tif_path, vector_path, buffer_width)
 
     return coverage_factor, tif_path, vector_path, buffer
 
-def generate_ideal_liters_per_dripper_map(buffer, liters_per_dripper, avg_fc):
-    buffer['ideal_liters'] = buffer['mean_value'].apply(
-        lambda fc: (liters_per_dripper / avg_fc) * fc
-    )
+def add_line_metrics(buffer, liters_per_dripper, avg_fc, actual_flow):
+    # Compute ideal_liters, rounded_ideal_liters and overuse_ratio for every line at once, without plotting
+    metrics = calculate_line_metrics(buffer['mean_value'].to_numpy(), liters_per_dripper, avg_fc, actual_flow)
+    for column, values in metrics.items():
+        buffer[column] = values
+    return buffer
 
-    max_value = buffer['ideal_liters'].max()
+def plot_line_values(buffer, column, title, cmap, max_value=None, ticks=None, value_format='{:.2f}', show=True):
+    if max_value is None:
+        max_value = buffer[column].max()
+    if ticks is None:
+        ticks = list(range(int(max_value) + 1))
     norm = mcolors.Normalize(vmin=0, vmax=max_value)
-    cmap = plt.cm.Blues
 
     fig, ax = plt.subplots(figsize=(10, 8))
-    buffer.plot(ax=ax, column='ideal_liters', cmap=cmap, linewidth=2, edgecolor='black', norm=norm)
+    buffer.plot(ax=ax, column=column, cmap=cmap, linewidth=2, edgecolor='black', norm=norm)
 
     sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
     sm._A = []
-    cbar = plt.colorbar(sm, ax=ax, ticks=range(int(max_value) + 1))
-    cbar.ax.set_yticklabels([str(i) for i in range(int(max_value) + 1)])
+    cbar = plt.colorbar(sm, ax=ax, ticks=ticks)
+    cbar.ax.set_yticklabels([str(i) for i in ticks])
 
-    for idx, row in buffer.iterrows():
-        ax.text(row.geometry.centroid.x, row.geometry.centroid.y, f'{row["ideal_liters"]:.2f}',
-                 color='white', fontsize=8, ha='center', va='center', bbox=dict(facecolor='black', alpha=0.5))
+    centroids = buffer.geometry.centroid
+    for x, y, value in zip(centroids.x, centroids.y, buffer[column]):
+        ax.text(x, y, value_format.format(value),
+                color='white', fontsize=8, ha='center', va='center', bbox=dict(facecolor='black', alpha=0.5))
 
-    ax.set_title('Ideal Liters per Dripper per Irrigation Line')
+    ax.set_title(title)
     ax.set_xlabel('Longitude')
     ax.set_ylabel('Latitude')
-    plt.show()
+    if show:
+        plt.show()
     plt.close(fig)  # Close the figure after displaying it
     return fig
 
-def generate_rounded_ideal_liters_map(buffer):
-    buffer['rounded_ideal_liters'] = buffer['ideal_liters'].apply(math.ceil)
-
-    max_value = buffer['rounded_ideal_liters'].max()
-    norm = mcolors.Normalize(vmin=0, vmax=max_value)
-    cmap = plt.cm.Blues
-
-    fig, ax = plt.subplots(figsize=(10, 8))
-    buffer.plot(ax=ax, column='rounded_ideal_liters', cmap=cmap, linewidth=2, edgecolor='black', norm=norm)
-
-    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-    sm._A = []
-    cbar = plt.colorbar(sm, ax=ax, ticks=range(int(max_value) + 1))
-    cbar.ax.set_yticklabels([str(i) for i in range(int(max_value) + 1)])
-
-    for idx, row in buffer.iterrows():
-        ax.text(row.geometry.centroid.x, row.geometry.centroid.y, f'{row["rounded_ideal_liters"]}',
-                 color='white', fontsize=8, ha='center', va='center', bbox=dict(facecolor='black', alpha=0.5))
-
-    ax.set_title('Rounded Ideal Liters to the Nearest Whole Number per Dripper per Irrigation Line')
-    ax.set_xlabel('Longitude')
-    ax.set_ylabel('Latitude')
-    plt.show()
-    plt.close(fig)  # Close the figure after displaying it
-    return fig
+def generate_ideal_liters_per_dripper_map(buffer, show=True):
+    # The map functions only draw: the per-line values come from add_line_metrics
+    return plot_line_values(buffer, 'ideal_liters', 'Ideal Liters per Dripper per Irrigation Line', plt.cm.Blues,
+                            show=show)
 
-def generate_overuse_ratio_map(buffer, actual_flow):
-    buffer['overuse_ratio'] = buffer['rounded_ideal_liters'].apply(
-        lambda ideal_liters: calculate_overuse_ratio(actual_flow, ideal_liters)
-    )
+def generate_rounded_ideal_liters_map(buffer, show=True):
+    return plot_line_values(buffer, 'rounded_ideal_liters',
+                            'Rounded Ideal Liters to the Nearest Whole Number per Dripper per Irrigation Line',
+                            plt.cm.Blues, value_format='{:.0f}', show=show)
 
+def generate_overuse_ratio_map(buffer, show=True):
     max_value = 500  # Set the maximum value. Good ratio: 500
-    norm = mcolors.Normalize(vmin=0, vmax=max_value)
-    cmap = plt.cm.Reds
-
-    fig, ax = plt.subplots(figsize=(10, 8))
-    buffer.plot(ax=ax, column='overuse_ratio', cmap=cmap, linewidth=2, edgecolor='black', norm=norm)
-
-    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
-    sm._A = []
     ticks = [0, max_value // 4, max_value // 2, 3 * max_value // 4, max_value]
-    cbar = plt.colorbar(sm, ax=ax, ticks=ticks)
-    cbar.ax.set_yticklabels([str(i) for i in ticks])
-
-    for idx, row in buffer.iterrows():
-        ax.text(row.geometry.centroid.x, row.geometry.centroid.y, f'{row["overuse_ratio"]:.2f}',
-                 color='white', fontsize=8, ha='center', va='center', bbox=dict(facecolor='black', alpha=0.5))
-
-    ax.set_title('Overuse Ratio per Irrigation Line')
-    ax.set_xlabel('Longitude')
-    ax.set_ylabel('Latitude')
-    plt.show()
-    plt.close(fig)  # Close the figure after displaying it
-    return fig
+    return plot_line_values(buffer, 'overuse_ratio', 'Overuse Ratio per Irrigation Line', plt.cm.Reds,
+                            max_value=max_value, ticks=ticks, show=show)
+
+def add_dripper_sizing(buffer, dripper_spacing, catalog=DRIPPER_CATALOG, spacings=None):
+    # Best catalog dripper (and spacing, if candidate spacings are given) for the ideal liters of every line.
+    # Returns the length-weighted overuse ratio of the whole network with the recommended drippers
+    lengths = buffer['length'].to_numpy() if 'length' in buffer else None
+    sizing = size_drippers(buffer['ideal_liters'].to_numpy(), dripper_spacing, catalog, spacings, lengths)
+    for column in ('recommended_flow', 'recommended_spacing', 'sized_overuse_ratio'):
+        buffer[column] = sizing[column]
+    return sizing['network_overuse_ratio']
+
+def add_delivered_flow(buffer, dripper_flow, dripper_spacing, liters_per_dripper, **hydraulic_parameters):
+    # Flow really delivered along every line once the pressure losses are considered (see hydraulics.py),
+    # and the overuse ratio of every line and of the whole plot with that flow instead of the nominal one
+    import hydraulics
+    lengths = buffer['length'].to_numpy()
+    laterals = hydraulics.simulate_laterals(lengths, dripper_flow, dripper_spacing, **hydraulic_parameters)
+    buffer['delivered_flow'] = laterals['mean_flow']
+    buffer['emission_uniformity'] = laterals['emission_uniformity']
+    with np.errstate(divide='ignore', invalid='ignore'):  # Lines without canopy have no ideal flow
+        buffer['hydraulic_overuse_ratio'] = calculate_overuse_ratio(laterals['mean_flow'],
+                                                                    buffer['rounded_ideal_liters'].to_numpy())
+    # Plot average weighted by the number of drippers of every line
+    delivered_flow = np.sum(laterals['inlet_flow']) / np.sum(laterals['drippers'])
+    return calculate_overuse_ratio(delivered_flow, liters_per_dripper)
+
+def add_network_flows(buffer, vector_path, dripper_flow, dripper_spacing, pump=None, tolerance=0.05):
+    # Role of every line in the network (main, submain or lateral) and the flow it has to carry, with the
+    # laterals drawing the flow their drippers deliver (see network_topology.py)
+    import hydraulics
+    import network_topology
+    vector_layer = read_vector_layer(vector_path)
+    topology = network_topology.build_network_topology(vector_layer.geometry.to_numpy(), pump, tolerance)
+    drippers = hydraulics.count_drippers(buffer['length'].to_numpy(), dripper_spacing)
+    flow = buffer['delivered_flow'].to_numpy() if 'delivered_flow' in buffer else dripper_flow
+    demand = network_topology.calculate_lateral_demand(topology['role'], drippers, flow)
+    buffer['network_role'] = topology['role']
+    # Parents as ids of the buffer index; -1 for the lines fed directly by the pump
+    buffer['network_parent'] = np.where(topology['parent'] >= 0, buffer.index.to_numpy()[topology['parent']], -1)
+    buffer['network_depth'] = topology['depth']
+    buffer['required_flow'] = network_topology.accumulate_upstream(topology['parent'], topology['depth'], demand)
+    return topology
+
+def add_sector_schedule(buffer, nhn_adjusted, irrigation_turn, irrigation_efficiency, irrigation_width,
+                        dripper_flow, dripper_spacing, pump_capacity, sector_field=None):
+    # Hours every line needs per turn (with its own Canopy Cover) and the sector it is irrigated in,
+    # packing the lines (or the groups of sector_field) under the pump capacity (L/h); see scheduler.py
+    import hydraulics
+    import scheduler
+    flow = buffer['delivered_flow'].to_numpy() if 'delivered_flow' in buffer else dripper_flow
+    hours = scheduler.calculate_line_hours(nhn_adjusted, buffer['mean_value'].to_numpy(), irrigation_turn,
+                                           irrigation_efficiency, irrigation_width, dripper_spacing, flow)
+    line_flow = hydraulics.count_drippers(buffer['length'].to_numpy(), dripper_spacing) * flow
+    groups = buffer[sector_field].to_numpy() if sector_field else None
+    buffer['irrigation_time'] = hours
+    buffer['sector'], table = scheduler.schedule_sectors(hours, line_flow, pump_capacity, groups)
+    return table, line_flow
+
+def generate_recommended_flow_map(buffer, show=True):
+    return plot_line_values(buffer, 'recommended_flow', 'Recommended Catalog Dripper Flow (L/h) per Irrigation Line',
+                            plt.cm.Blues, value_format='{:.1f}', show=show)
 
 if __name__ == "__main__":
     obtain_coverage_factor_and_create_buffer()
@@ -0,0 +1,573 @@
+"""
+Non-interactive entry point: runs the full ecolabel pipeline from a job file.
+
+Usage:
+    python headless.py job.toml [--output-dir DIR]
+
+The job file can be JSON, TOML or YAML (YAML needs PyYAML). Relative paths are resolved
+against the folder of the job file, and unknown sections or keys are reported as errors before
+anything runs. Example (TOML):
+
+    [et0]
+    value = 6.5                 # ET0 from a reference station (mm/day), or give
+                                # tmax, tmin, tmean, rs, rhmean, u2, z, lat and day_of_year
+
+    [crop]
+    kc = 0.7
+    pe = 0.0
+    aw = 0.0
+    eto_percentage = 0.3
+
+    [canopy]
+    cc = 0.5                    # or tif_path = "canopy.tif" and vector_path = "network.shp"
+    overlap = "shared"          # optional, pixels shared by neighbouring rows: "shared", "first" or "split"
+    streaming = false           # optional: read the network in chunks of chunk_size lines (default 10000)
+                                # for networks too large for memory; no maps are drawn
+    series = ["may.tif", "jun.tif", "jul.tif"]   # optional (needs vector_path): flights of the season on one
+    series_dates = ["2025-05-10", "2025-06-12", "2025-07-15"]  # grid, for a Canopy Cover time series per line
+    zone_cache_dir = "cache"    # optional: folder for the zone index of the series (default: next to the network)
+
+    [dripper]
+    flow = 2.0
+    spacing = 0.75
+    irrigation_width = 1.5
+
+    [irrigation]
+    turn = 7
+    hours = 8
+    efficiency = 0.9
+
+    [output]
+    directory = "results"
+    pdf = "report.pdf"          # optional, relative to the output directory
+    maps = true                 # optional: false computes the per-line values without drawing any map
+    map_format = "vector"       # optional: "vector" (needs svglib) or "raster" (default)
+    dpi = 150                   # optional: resolution of the raster figures
+    results = "parquet"         # optional: also write plot_results and line_results tables ("parquet" or "csv")
+
+    [season]                    # optional: daily water balance over a season (needs aw > 0 in [crop])
+    weather = "weather.csv"     # one row per day: date (or day_of_year), tmax, tmin, tmean, rs, rhmean, u2
+                                # (or et0) and optionally pe (effective precipitation, mm)
+    z = 600                     # altitude (m) and latitude, only needed to calculate ET0 from the weather
+    lat = 42.3
+    schedule = "raw"            # "raw": refill when the depletion exceeds RAW; "fixed": the installation's dose
+
+    [sizing]                    # optional (needs the canopy TIF and network): catalog dripper for every line
+    catalog = [1.0, 1.6, 2.0, 2.3, 4.0]                     # optional, see irrigation_network_efficiency.py
+    spacings = [0.5, 0.75, 1.0]                             # optional: also suggest a new dripper spacing
+
+    [hydraulics]                # optional (needs the canopy TIF and network): pressure losses along the lines
+    inlet_pressure = 10.0       # m at the inlet of every line
+    nominal_pressure = 10.0     # m at which the drippers give their nominal flow
+    exponent = 0.5              # emitter exponent (about 0 for pressure-compensating drippers)
+    diameter = 0.0136           # inner diameter of the lines (m)
+    slope = 0.0                 # optional, m of rise per m of line
+
+    [network]                   # optional (needs the canopy TIF and network): pipe graph and flow per pipe
+    pump = [500000.0, 4645000.0]  # pump position in the CRS of the network layer (only optional when
+                                  # the layer holds separate drip lines, none connected to another)
+    tolerance = 0.05            # optional: m between two lines to consider them connected
+
+    [segments]                  # optional (needs the canopy TIF and network): metrics along the lines
+    length = 10.0               # m per segment, or drippers = 20 for segments of 20 dripper spacings
+
+    [schedule]                  # optional (needs the canopy TIF and network): sectors under the pump capacity
+    pump_capacity = 20.0        # m3/h
+    sector_field = "valve"      # optional: field of the network layer with the lines opened together
+
+    [uncertainty]               # optional: Monte Carlo analysis of the overuse ratio and the letter
+    samples = 100000
+    seed = 1
+    kc = { dist = "normal", sd = 0.05 }                 # centred on the value of the job
+    fc = { dist = "uniform", low = 0.4, high = 0.6 }
+    irrigation_efficiency = { dist = "triangular", low = 0.85, high = 0.95 }
+
+    [optimize]                  # optional: installations reaching a target letter with the least water
+    target_letter = "A"
+    dripper_flows = [1.0, 1.6, 2.0, 2.2, 3.0, 4.0]          # optional candidates (see optimizer.py
+    dripper_spacings = [0.4, 0.5, 0.6, 0.75, 1.0]           # for the defaults), also irrigation_hours
+                                                            # and irrigation_turns
+"""
+import argparse
+import json
+import os
+import sys
+
+import matplotlib
+
+matplotlib.use("Agg")  # Never open a window
+
+import matplotlib.pyplot as plt
+from calc_etp import calculate_et0
+from pipeline import calculate_fao_results, calculate_irrigation_results, format_fao_summary, format_irrigation_summary
+from diagrams import create_diagram
+from ratio_label import LabelRenderer
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+ET0_PARAMETERS = ("tmax", "tmin", "tmean", "rs", "rhmean", "u2", "z", "lat", "day_of_year")
+# Keys every section of a job file can hold (the [uncertainty] section also takes the inputs of
+# uncertainty.PARAMETERS) and the top-level keys that are not sections
+JOB_SECTIONS = {
+    "et0": ("value",) + ET0_PARAMETERS,
+    "crop": ("kc", "pe", "aw", "eto_percentage"),
+    "canopy": ("cc", "tif_path", "vector_path", "overlap", "streaming", "chunk_size", "series", "series_dates",
+               "zone_cache_dir"),
+    "dripper": ("flow", "spacing", "irrigation_width"),
+    "irrigation": ("turn", "hours", "efficiency"),
+    "output": ("directory", "pdf", "maps", "map_format", "dpi", "results"),
+    "season": ("weather", "z", "lat", "schedule", "initial_depletion"),
+    "sizing": ("catalog", "spacings"),
+    "hydraulics": ("inlet_pressure", "nominal_pressure", "exponent", "diameter", "roughness", "slope",
+                   "max_iterations", "tolerance"),
+    "network": ("pump", "tolerance"),
+    "segments": ("length", "drippers"),
+    "schedule": ("pump_capacity", "sector_field"),
+    "uncertainty": ("samples", "seed"),
+    "optimize": ("target_letter", "dripper_flows", "dripper_spacings", "irrigation_hours", "irrigation_turns"),
+}
+JOB_KEYS = ("name", "base_dir")
+
+# One label renderer per DPI, reused by every job run in this process
+_label_renderers = {}
+
+
+def get_label_renderer(dpi=None):
+    dpi = dpi or 100
+    if dpi not in _label_renderers:
+        _label_renderers[dpi] = LabelRenderer(dpi=dpi)
+    return _label_renderers[dpi]
+
+
+def read_config_file(path):
+    """Read a JSON, TOML or YAML file into a dictionary."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path, "r", encoding="utf-8") as file:
+            config = json.load(file)
+    elif extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(path, "rb") as file:
+            config = tomllib.load(file)
+    elif extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("PyYAML is required to read YAML files (pip install pyyaml)")
+        with open(path, "r", encoding="utf-8") as file:
+            config = yaml.safe_load(file)
+    else:
+        raise ValueError(f"Unsupported file format: {path} (use .json, .toml or .yaml)")
+    return config
+
+
+def load_job(job_path):
+    """Read a job file; relative paths in it are resolved against its folder."""
+    job = read_config_file(job_path)
+    if not isinstance(job, dict):
+        raise ValueError(f"The job file {job_path} must hold sections such as [crop] and [dripper]")
+    job["base_dir"] = os.path.dirname(os.path.abspath(job_path))
+    return job
+
+
+def _resolve_path(job, path):
+    if path is None or os.path.isabs(path):
+        return path
+    return os.path.join(job.get("base_dir", os.getcwd()), path)
+
+
+def _require(section, name, section_name):
+    if name not in section:
+        raise ValueError(f"Missing '{name}' in the [{section_name}] section of the job file")
+    return section[name]
+
+
+def calculate_job_et0(job):
+    et0_section = job.get("et0", {})
+    if "value" in et0_section:
+        return float(et0_section["value"])
+    values = [float(_require(et0_section, name, "et0")) for name in ET0_PARAMETERS]
+    return calculate_et0(*values)
+
+
+def run_season(job, fao_results, irrigation_results, output_dir):
+    """Run the daily water balance of the [season] section and write water_balance.csv."""
+    import pandas as pd
+    import water_balance
+
+    season = job["season"]
+    weather = water_balance.read_weather(_resolve_path(job, _require(season, "weather", "season")))
+    if "et0" in weather:
+        et0 = water_balance.calculate_season_et0(weather, None, None)
+    else:
+        et0 = water_balance.calculate_season_et0(weather, float(_require(season, "z", "season")),
+                                                 float(_require(season, "lat", "season")))
+    pe = weather["pe"].to_numpy(dtype=float) if "pe" in weather else fao_results["pe"]
+
+    applied_depth = water_balance.calculate_applied_depth(
+        irrigation_results["dripper_flow"], irrigation_results["irrigation_hours"],
+        irrigation_results["irrigation_efficiency"], irrigation_results["dripper_spacing"],
+        irrigation_results["irrigation_width"])
+    results = water_balance.simulate_water_balance(
+        et0, fao_results["kc"], fao_results["fc"], fao_results["au"], pe=pe,
+        eto_percentage=fao_results["eto_percentage"], irrigation_turn=irrigation_results["irrigation_turn"],
+        irrigation_efficiency=irrigation_results["irrigation_efficiency"], schedule=season.get("schedule", "raw"),
+        applied_depth=applied_depth, initial_depletion=float(season.get("initial_depletion", 0.0)))
+
+    daily = pd.DataFrame({
+        "et0": et0,
+        "depletion": results["daily_depletion"][:, 0],
+        "ks": results["daily_ks"][:, 0],
+        "eta": results["daily_eta"][:, 0],
+        "irrigation_net": results["daily_irrigation"][:, 0],
+        "drainage": results["daily_drainage"][:, 0],
+        "cumulative_applied": results["daily_cumulative_applied"][:, 0],
+        "cumulative_needed": results["daily_cumulative_needed"][:, 0],
+    })
+    if "date" in weather:
+        daily.insert(0, "date", weather["date"])
+    daily.to_csv(os.path.join(output_dir, "water_balance.csv"), index=False)
+    return results
+
+
+def run_segments(job, tif_path, vector_path, irrigation_results, fc, output_dir):
+    # Canopy Cover, ideal liters and overuse ratio of every segment of the lines, written to segment_results
+    import gis
+    import results_export
+    section = job["segments"]
+    if "drippers" in section:
+        segment_length = section["drippers"] * irrigation_results["dripper_spacing"]
+    else:
+        segment_length = float(_require(section, "length", "segments"))
+    overlap = job.get("canopy", {}).get("overlap", "shared")
+    segments = gis.calculate_segment_statistics(tif_path, vector_path, irrigation_results["buffer_width"],
+                                                segment_length, overlap=overlap)
+    gis.add_line_metrics(segments, irrigation_results["liters_per_dripper"], fc, irrigation_results["dripper_flow"])
+    result_format = job.get("output", {}).get("results", "csv")
+    results_export.write_table(results_export.segment_results_table(segments, job.get("name")),
+                               os.path.join(output_dir, f"segment_results.{result_format}"))
+    return segments, segment_length
+
+
+def validate_job(job):
+    """Check that every section of a job is a table and only holds keys the pipeline knows."""
+    for name, section in job.items():
+        if name in JOB_KEYS or section is None:
+            continue
+        if name not in JOB_SECTIONS:
+            raise ValueError(f"Unknown section [{name}] in the job file (use {', '.join(JOB_SECTIONS)})")
+        if not isinstance(section, dict):
+            raise ValueError(f"The [{name}] section of the job file must be a table of values")
+        allowed = JOB_SECTIONS[name]
+        if name == "uncertainty":
+            import uncertainty
+            allowed = allowed + uncertainty.PARAMETERS
+        unknown = [key for key in section if key not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown key(s) in the [{name}] section of the job file: {', '.join(unknown)}")
+
+
+def run_canopy(job, buffer_width, draw_maps):
+    """Canopy Cover: given directly or calculated from the drone mask and the irrigation network."""
+    canopy = job.get("canopy", {})
+    tif_path = _resolve_path(job, canopy.get("tif_path"))
+    vector_path = _resolve_path(job, canopy.get("vector_path"))
+    overlap = canopy.get("overlap", "shared")
+    if tif_path and vector_path and canopy.get("streaming", False):
+        # Per-line table without geometries; the line metrics are added once the FAO chain has run
+        import gis
+        buffer = gis.calculate_line_statistics_streaming(vector_path, tif_path, buffer_width,
+                                                         int(canopy.get("chunk_size", 10000)), overlap=overlap)
+        return buffer["mean_value"].mean(), buffer, {}
+    if tif_path and vector_path:
+        import gis
+        return gis.calculate_coverage_factor(tif_path, vector_path, buffer_width, show=False, plot=draw_maps,
+                                             overlap=overlap)
+    return float(_require(canopy, "cc", "canopy")), None, {}
+
+
+def run_canopy_series(job, vector_path, buffer_width, output_dir):
+    # Canopy Cover of every line on every flight of the season, written to canopy_series.csv
+    import gis
+    canopy = job["canopy"]
+    cc_series = gis.calculate_canopy_series(vector_path, [_resolve_path(job, path) for path in canopy["series"]],
+                                            buffer_width, canopy.get("series_dates"), canopy.get("overlap", "shared"),
+                                            cache_dir=_resolve_path(job, canopy.get("zone_cache_dir")))
+    cc_series.rename_axis("line_id").to_csv(os.path.join(output_dir, "canopy_series.csv"))
+    return cc_series
+
+
+def run_optimize(job, fao_results, irrigation_results, output_dir):
+    # Pareto set of the installations reaching the target letter, written to optimization.csv
+    import optimizer
+    optimize = job["optimize"]
+    candidates = {name: optimize[name] for name in ("dripper_flows", "dripper_spacings", "irrigation_hours",
+                                                     "irrigation_turns") if name in optimize}
+    optimization = optimizer.optimize_installation(
+        fao_results["nhn_adjusted"], fao_results["fc"], irrigation_results["irrigation_efficiency"],
+        irrigation_results["irrigation_width"], optimize.get("target_letter", "A"), **candidates)
+    optimization.to_csv(os.path.join(output_dir, "optimization.csv"), index=False)
+    return optimization
+
+
+def run_uncertainty(job, fao_results, irrigation_results):
+    import uncertainty
+    section = job["uncertainty"]
+    distributions = {name: spec for name, spec in section.items() if isinstance(spec, dict)}
+    specs = uncertainty.build_specs({**fao_results, **irrigation_results}, distributions)
+    return uncertainty.run_uncertainty(specs, int(section.get("samples", 100000)), seed=section.get("seed"))
+
+
+def run_sizing(job, buffer, irrigation_results, draw_maps, gis_figures):
+    # Catalog dripper of every line; returns the overuse ratio of the network with the recommended drippers
+    import gis
+    sizing = job["sizing"]
+    network_overuse_ratio = gis.add_dripper_sizing(buffer, irrigation_results["dripper_spacing"],
+                                                   sizing.get("catalog", gis.DRIPPER_CATALOG), sizing.get("spacings"))
+    if draw_maps:
+        gis_figures["recommended_flow"] = gis.generate_recommended_flow_map(buffer, show=False)
+    return network_overuse_ratio
+
+
+def run_hydraulics(job, buffer, irrigation_results):
+    # Flow delivered along every line with the pressure losses; returns the overuse ratio with that flow
+    import gis
+    return gis.add_delivered_flow(buffer, irrigation_results["dripper_flow"], irrigation_results["dripper_spacing"],
+                                  irrigation_results["liters_per_dripper"], **job["hydraulics"])
+
+
+def run_network(job, buffer, vector_path, irrigation_results):
+    import gis
+    return gis.add_network_flows(buffer, vector_path, irrigation_results["dripper_flow"],
+                                 irrigation_results["dripper_spacing"], **job["network"])
+
+
+def run_schedule(job, buffer, fao_results, irrigation_results, output_dir):
+    # Sectors under the pump capacity, written to sectors.csv
+    import gis
+    section = job["schedule"]
+    pump_capacity = float(_require(section, "pump_capacity", "schedule")) * 1000  # m3/h to L/h
+    sectors, line_flow = gis.add_sector_schedule(
+        buffer, fao_results["nhn_adjusted"], irrigation_results["irrigation_turn"],
+        irrigation_results["irrigation_efficiency"], irrigation_results["irrigation_width"],
+        irrigation_results["dripper_flow"], irrigation_results["dripper_spacing"], pump_capacity,
+        section.get("sector_field"))
+    sectors.to_csv(os.path.join(output_dir, "sectors.csv"), index=False)
+    return sectors, line_flow, pump_capacity
+
+
+def write_summary(path, job, fao_results, irrigation_results, buffer, sections):
+    """Write summary.txt with the FAO and irrigation summaries and one block per optional section run."""
+    overuse_ratio = irrigation_results["overuse_ratio"]
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("FAO-56 Penman-Monteith Data Summary\n")
+        file.write(format_fao_summary(fao_results))
+        file.write("\nIrrigation Data Summary\n")
+        file.write(format_irrigation_summary(irrigation_results))
+        if sections.get("season") is not None:
+            import water_balance
+            file.write("\nSeason Water Balance Summary\n")
+            file.write(water_balance.format_water_balance_summary(sections["season"]))
+        if sections.get("optimization") is not None:
+            import optimizer
+            file.write("\nInstallation Optimization Summary\n")
+            file.write(optimizer.format_optimization_summary(sections["optimization"],
+                                                             job["optimize"].get("target_letter", "A")))
+        if sections.get("sizing") is not None:
+            file.write("\nDripper Sizing Summary\n")
+            file.write(f"Overuse ratio of the network with the recommended catalog drippers: "
+                       f"{sections['sizing']:.2f} (current: {overuse_ratio:.2f})\n")
+        if sections.get("hydraulics") is not None:
+            file.write("\nHydraulic Summary\n")
+            file.write(f"Mean flow delivered per dripper with the pressure losses: "
+                       f"{buffer['delivered_flow'].mean():.2f} L/h "
+                       f"(nominal: {irrigation_results['dripper_flow']:.2f} L/h)\n")
+            file.write(f"Lowest emission uniformity of a line (min / mean flow): "
+                       f"{buffer['emission_uniformity'].min():.2f}\n")
+            file.write(f"Overuse ratio with the delivered flow: {sections['hydraulics']:.2f} "
+                       f"(nominal flow: {overuse_ratio:.2f})\n")
+        if sections.get("network") is not None:
+            import network_topology
+            file.write("\nNetwork Flow Summary\n")
+            file.write(network_topology.format_network_summary(sections["network"], buffer["required_flow"].to_numpy()))
+        if sections.get("schedule") is not None:
+            import scheduler
+            sectors, line_flow, pump_capacity = sections["schedule"]
+            file.write("\nSector Schedule Summary\n")
+            file.write(scheduler.format_schedule_summary(sectors, buffer["irrigation_time"].to_numpy(), line_flow,
+                                                         pump_capacity, irrigation_results["irrigation_turn"]))
+        if sections.get("canopy_series") is not None:
+            import canopy_series
+            file.write("\nCanopy Cover Series Summary\n")
+            file.write(canopy_series.format_canopy_series_summary(sections["canopy_series"]))
+        if sections.get("segments") is not None:
+            import line_segments
+            file.write("\nSegment Analysis Summary\n")
+            file.write(line_segments.format_segment_summary(*sections["segments"]))
+        if sections.get("uncertainty") is not None:
+            import uncertainty
+            file.write("\nUncertainty Analysis Summary\n")
+            file.write(uncertainty.format_uncertainty_summary(sections["uncertainty"]))
+
+
+def run_job(job, output_dir=None):
+    """Run every calculation of main.main for a job and write the summaries, figures and PDF."""
+    validate_job(job)
+    output = job.get("output", {})
+    output_dir = output_dir or _resolve_path(job, output.get("directory", "results"))
+    os.makedirs(output_dir, exist_ok=True)
+
+    crop = job.get("crop", {})
+    canopy = job.get("canopy", {})
+    dripper = job.get("dripper", {})
+    irrigation = job.get("irrigation", {})
+
+    dripper_flow = float(_require(dripper, "flow", "dripper"))
+    dripper_spacing = float(_require(dripper, "spacing", "dripper"))
+    irrigation_width = float(_require(dripper, "irrigation_width", "dripper"))
+    buffer_width = irrigation_width / 2
+
+    et0 = calculate_job_et0(job)
+    kc = float(_require(crop, "kc", "crop"))
+
+    draw_maps = output.get("maps", True) and not canopy.get("streaming", False)
+    fc, buffer, gis_figures = run_canopy(job, buffer_width, draw_maps)
+    tif_path = _resolve_path(job, canopy.get("tif_path"))
+    vector_path = _resolve_path(job, canopy.get("vector_path"))
+
+    fao_results = calculate_fao_results(et0, kc, fc, float(crop.get("pe", 0.0)), float(crop.get("aw", 0.0)),
+                                        float(_require(crop, "eto_percentage", "crop")))
+    irrigation_results = calculate_irrigation_results(
+        fao_results["nhn_adjusted"], fc,
+        int(_require(irrigation, "turn", "irrigation")),
+        float(_require(irrigation, "hours", "irrigation")),
+        float(_require(irrigation, "efficiency", "irrigation")),
+        dripper_flow, dripper_spacing, irrigation_width
+    )
+    fao_data_summary = format_fao_summary(fao_results)
+    irrigation_data_summary = format_irrigation_summary(irrigation_results)
+
+    # Results of the optional sections, in the order their summaries are written
+    sections = {}
+    if job.get("season"):
+        sections["season"] = run_season(job, fao_results, irrigation_results, output_dir)
+    if job.get("optimize"):
+        sections["optimization"] = run_optimize(job, fao_results, irrigation_results, output_dir)
+    if buffer is not None:
+        import gis
+        gis.add_line_metrics(buffer, irrigation_results["liters_per_dripper"], fc, dripper_flow)
+        if job.get("sizing") is not None:
+            sections["sizing"] = run_sizing(job, buffer, irrigation_results, draw_maps, gis_figures)
+        if job.get("hydraulics") is not None:
+            sections["hydraulics"] = run_hydraulics(job, buffer, irrigation_results)
+        if job.get("network") is not None:
+            sections["network"] = run_network(job, buffer, vector_path, irrigation_results)
+        if job.get("schedule") is not None:
+            sections["schedule"] = run_schedule(job, buffer, fao_results, irrigation_results, output_dir)
+    if canopy.get("series") and vector_path:
+        sections["canopy_series"] = run_canopy_series(job, vector_path, buffer_width, output_dir)
+    if buffer is not None and job.get("segments") is not None:
+        sections["segments"] = run_segments(job, tif_path, vector_path, irrigation_results, fc, output_dir)
+    if job.get("uncertainty"):
+        sections["uncertainty"] = run_uncertainty(job, fao_results, irrigation_results)
+
+    fig_diagram, _ = create_diagram(
+        et0, fao_results["etc"], fao_results["nhn"], fao_results["nhn_adjusted"],
+        irrigation_results["irrigation_need"], irrigation_results["dn_turn"], irrigation_results["dn_hour"],
+        irrigation_results["gross_demand"], irrigation_results["irrigation_turn"],
+        irrigation_results["liters_per_dripper"]
+    )
+    overuse_ratio = irrigation_results["overuse_ratio"]
+    label_path = os.path.join(output_dir, "label.png")
+    assigned_letter = get_label_renderer(output.get("dpi")).render(overuse_ratio, label_path)
+
+    fig_ideal_liters, fig_rounded_ideal_liters, fig_overuse_ratio = None, None, None
+    if buffer is not None and draw_maps:
+        fig_ideal_liters = gis.generate_ideal_liters_per_dripper_map(buffer, show=False)
+        fig_rounded_ideal_liters = gis.generate_rounded_ideal_liters_map(buffer, show=False)
+        fig_overuse_ratio = gis.generate_overuse_ratio_map(buffer, show=False)
+        gis_figures.update({
+            "ideal_liters": fig_ideal_liters,
+            "rounded_ideal_liters": fig_rounded_ideal_liters,
+            "overuse_ratio": fig_overuse_ratio,
+        })
+
+    write_summary(os.path.join(output_dir, "summary.txt"), job, fao_results, irrigation_results, buffer, sections)
+
+    figures = {"diagram": fig_diagram, **gis_figures}
+    for name, fig in figures.items():
+        fig.savefig(os.path.join(output_dir, f"{name}.png"), format="png", dpi=output.get("dpi") or "figure")
+
+    pdf_path = None
+    if output.get("pdf"):
+        pdf_path = os.path.join(output_dir, output["pdf"])
+        import pdf_creator
+        dem_data, vector_data = None, None
+        if buffer is not None and draw_maps:
+            dem_data = gis.read_overview(tif_path)[0]
+            vector_data = gis.read_vector_layer(vector_path)
+        pdf_creator.save_plots_and_create_pdf(
+            fao_data_summary, irrigation_data_summary, os.path.join(IMAGES_DIR, "kawaii_water_drop.jpg"),
+            dem_data, vector_data, fig_diagram, label_path, pdf_path,
+            fig_ideal_liters, fig_rounded_ideal_liters, fig_overuse_ratio,
+            overuse_ratio=overuse_ratio,
+            assigned_letter=assigned_letter,
+            interactive=False,
+            map_format=output.get("map_format", "raster"),
+            dpi=output.get("dpi")
+        )
+
+    result_paths = {}
+    if output.get("results"):
+        import results_export
+        # Streamed tables have no geometry; otherwise the lines of the (cached) network layer are written
+        lines = gis.read_vector_layer(vector_path).geometry if hasattr(buffer, "geometry") else None
+        result_paths = results_export.write_results(
+            {**fao_results, **irrigation_results, "assigned_letter": assigned_letter}, buffer, output_dir,
+            output["results"], name=job.get("name"), lines=lines)
+
+    for fig in figures.values():
+        plt.close(fig)
+
+    return {
+        **fao_results,
+        **irrigation_results,
+        "assigned_letter": assigned_letter,
+        "buffer": buffer,
+        "output_dir": output_dir,
+        "pdf_path": pdf_path,
+        "result_paths": result_paths,
+        "season": sections.get("season"),
+        "canopy_series": sections.get("canopy_series"),
+        "segments": sections["segments"][0] if "segments" in sections else None,
+        "uncertainty": sections.get("uncertainty"),
+        "optimization": sections.get("optimization"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Irrigation Ecolabel calculation from a job file, without any window.")
+    parser.add_argument("job", help="Job file (.json, .toml, .yaml)")
+    parser.add_argument("--output-dir", help="Output folder (overrides [output] directory in the job file)")
+    args = parser.parse_args(argv)
+
+    try:
+        job = load_job(args.job)
+        results = run_job(job, args.output_dir)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except (KeyError, TypeError) as e:
+        # Values of the wrong type or missing keys in the job file
+        print(f"Error: invalid job file {args.job}: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Overuse ratio: {results['overuse_ratio']:.2f} -> label {results['assigned_letter']}")
+    print(f"Results written to: {results['output_dir']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
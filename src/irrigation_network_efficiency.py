@@ -1,3 +1,9 @@
+import numpy as np
+
+# Commercial dripper flows (L/h) and usual dripper spacings (m), sorted in ascending order
+DRIPPER_CATALOG = (0.6, 1.0, 1.2, 1.6, 2.0, 2.2, 2.3, 3.0, 3.5, 4.0, 8.0)
+DRIPPER_SPACINGS = (0.3, 0.4, 0.5, 0.6, 0.75, 0.8, 1.0, 1.2)
+
 def calculate_overuse_ratio(actual_flow, ideal_liters):
     ratio = ((actual_flow - ideal_liters) / ideal_liters) * 100
     return ratio
@@ -19,3 +25,60 @@ def calculate_ideal_liters_per_dripper(fc, adjusted_nhn, irrigation_width, dripp
     liters_per_dripper = dn_linear_meter * dripper_spacing
 
     return liters_per_dripper
+
+def calculate_ideal_liters_per_line(fc_per_line, liters_per_dripper, avg_fc):
+    # Scale the plot's ideal liters per dripper by the Canopy Cover of every line relative to the plot average
+    return (liters_per_dripper / avg_fc) * np.asarray(fc_per_line, dtype=float)
+
+def calculate_line_metrics(fc_per_line, liters_per_dripper, avg_fc, actual_flow):
+    # Ideal liters, rounded ideal liters and overuse ratio of every irrigation line in one vectorized pass
+    ideal_liters = calculate_ideal_liters_per_line(fc_per_line, liters_per_dripper, avg_fc)
+    rounded_ideal_liters = np.ceil(ideal_liters)
+    with np.errstate(divide='ignore', invalid='ignore'):  # Lines without canopy have no ideal flow
+        overuse_ratio = calculate_overuse_ratio(np.asarray(actual_flow, dtype=float), rounded_ideal_liters)
+    return {
+        'ideal_liters': ideal_liters,
+        'rounded_ideal_liters': rounded_ideal_liters,
+        'overuse_ratio': overuse_ratio,
+    }
+
+def select_catalog_flows(ideal_liters, catalog=DRIPPER_CATALOG):
+    # Smallest catalog flow that gives at least the ideal liters of each line (binary search on the
+    # sorted catalog). Lines above the largest flow get the largest one and stay under-irrigated
+    catalog = np.sort(np.asarray(catalog, dtype=float))
+    index = np.searchsorted(catalog, ideal_liters, side='left')
+    return catalog[np.minimum(index, len(catalog) - 1)]
+
+def size_drippers(ideal_liters, dripper_spacing, catalog=DRIPPER_CATALOG, spacings=None, lengths=None):
+    # Catalog dripper (and, when candidate spacings are given, dripper spacing) of every line with the
+    # lowest overuse ratio. ideal_liters are per dripper at the current dripper_spacing; the ideal flow
+    # per dripper grows with the spacing, since each dripper irrigates a longer stretch of the line
+    ideal_liters = np.asarray(ideal_liters, dtype=float)
+    spacings = np.asarray([dripper_spacing] if spacings is None else spacings, dtype=float)
+
+    # Evaluate every line against every candidate spacing at once: shape (lines, spacings)
+    ideal_per_spacing = ideal_liters[:, None] * (spacings[None, :] / dripper_spacing)
+    flows = select_catalog_flows(ideal_per_spacing, catalog)
+    with np.errstate(divide='ignore', invalid='ignore'):  # Lines without canopy have no ideal flow
+        ratios = calculate_overuse_ratio(flows, ideal_per_spacing)
+
+    # Prefer spacings without under-irrigation, then the lowest overuse ratio
+    score = np.where(ratios >= 0, ratios, np.inf)
+    score = np.where(np.isnan(score), np.inf, score)
+    best = np.argmin(score, axis=1)
+    lines = np.arange(len(ideal_liters))
+    recommended_flow = flows[lines, best]
+    recommended_spacing = spacings[best]
+    overuse_ratio = ratios[lines, best]
+
+    # Network ratio weighted by the length of the lines: water delivered per meter of line against the
+    # ideal water per meter (which does not depend on the spacing)
+    lengths = np.ones(len(ideal_liters)) if lengths is None else np.asarray(lengths, dtype=float)
+    delivered = np.sum(recommended_flow / recommended_spacing * lengths)
+    ideal = np.sum(ideal_liters / dripper_spacing * lengths)
+    return {
+        'recommended_flow': recommended_flow,
+        'recommended_spacing': recommended_spacing,
+        'sized_overuse_ratio': overuse_ratio,
+        'network_overuse_ratio': calculate_overuse_ratio(delivered, ideal) if ideal > 0 else np.nan,
+    }
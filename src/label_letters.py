@@ -0,0 +1,27 @@
+"""
+Letters of the ecolabel from the overuse ratio, without any plotting dependency, so numeric modules
+(optimizer, uncertainty) can classify millions of ratios without importing matplotlib.
+ratio_label re-exports everything here next to the label drawing.
+"""
+import numpy as np
+
+LABELS = ["A+++", "A++", "A+", "A", "B", "C", "D"]
+VALUE_RANGES = [5, 15, 30, 50, 80, 150, 300]  # Adjust the upper limit for each range
+
+
+def assign_letter_indices(overuse_ratios):
+    # Index in LABELS of the letter for each overuse ratio
+    ratios = np.asarray(overuse_ratios, dtype=float)
+    idx = np.digitize(ratios, VALUE_RANGES) - 1
+    idx = np.where(ratios < 5, 0, idx)
+    idx = np.where(ratios > 150, len(LABELS) - 1, idx)
+    return idx
+
+
+def assign_letters(overuse_ratios):
+    # Vectorized classification for high-volume use: array of letters for an array of ratios
+    return np.asarray(LABELS)[assign_letter_indices(overuse_ratios)]
+
+
+def assign_letter(overuse_ratio):
+    return LABELS[int(assign_letter_indices(overuse_ratio))]
@@ -0,0 +1,218 @@
+"""
+Canopy Cover and line metrics along the irrigation lines, in segments of a fixed length (every N
+meters, or every K drippers with N = K * dripper spacing).
+
+Everything works on the coordinates of all the lines at once, without a Python loop per line or per
+segment. MultiLineStrings are split part by part, so no segment jumps over a gap between parts:
+
+1. The distance of every vertex along its part is the cumulative sum of the vertex-to-vertex lengths,
+   and every part gets ceil(length / N) segments (the last one keeps the remainder of the part).
+2. The segment geometries are made of the points at the cut distances (interpolated with one
+   searchsorted over all the parts) and the vertices between them, built with one
+   shapely.linestrings call.
+3. For the zonal statistics, only the buffers of the whole lines are rasterized (one shape per line)
+   and every pixel goes to the segment its centre projects on, so millions of segments cost about
+   the same as the lines themselves.
+"""
+import numpy as np
+import rasterio
+import shapely
+
+from zonal import (
+    accumulate_zone_sums,
+    assign_non_overlapping_layers,
+    check_overlap_mode,
+    empty_zone_sums,
+    finalize_zone_sums,
+    iter_tile_windows,
+    match_tiles_to_geometries,
+    window_zone_pixels
+)
+
+
+def count_segments(lengths, segment_length):
+    # Segments of every part; a small tolerance keeps lengths that are exact multiples from getting a
+    # zero-length last segment
+    return np.maximum(np.ceil(np.asarray(lengths, dtype=float) / segment_length - 1e-9), 1).astype(np.int64)
+
+
+def build_line_table(geometries, segment_length):
+    """
+    Vertices of every part of the lines with their distance along the part, and the numbering of
+    the segments of every part (the global segment ids used by split_lines and locate_segments).
+    """
+    if segment_length <= 0:
+        raise ValueError("The segment length must be greater than 0")
+    geometries = np.asarray(geometries, dtype=object)
+    parts, part_line = shapely.get_parts(geometries, return_index=True)
+    coords, vertex_part = shapely.get_coordinates(parts, return_index=True)
+    n_parts = len(parts)
+
+    # Distance of every vertex along its part
+    step = np.hypot(*np.diff(coords, axis=0).T) if len(coords) else np.empty(0)
+    step[vertex_part[1:] != vertex_part[:-1]] = 0.0  # No length between the last vertex of a part and the next
+    distance = np.concatenate(([0.0], np.cumsum(step)))[:len(coords)]
+    first_vertex = np.searchsorted(vertex_part, np.arange(n_parts))
+    last_vertex = np.concatenate((first_vertex[1:], [len(coords)])) - 1
+    distance -= distance[first_vertex][vertex_part]
+
+    n_segments = count_segments(shapely.length(parts), segment_length)
+    return {"n_lines": len(geometries), "segment_length": segment_length, "coords": coords,
+            "vertex_part": vertex_part, "distance": distance, "first_vertex": first_vertex,
+            "last_vertex": last_vertex, "part_line": part_line, "part_length": shapely.length(parts),
+            "n_segments": n_segments, "part_first_segment": np.cumsum(n_segments) - n_segments}
+
+
+def split_lines(table):
+    """
+    Segments of every line of a build_line_table table. Returns the segment geometries and, for
+    every segment, the index of its line, its number along the line and its start distance along
+    its part.
+    """
+    coords, vertex_part, distance = table["coords"], table["vertex_part"], table["distance"]
+    first_vertex, last_vertex = table["first_vertex"], table["last_vertex"]
+    part_length, n_segments = table["part_length"], table["n_segments"]
+    part_first_segment, segment_length = table["part_first_segment"], table["segment_length"]
+    if len(coords) == 0:
+        return {"geometry": np.empty(0, dtype=object), "line": np.empty(0, dtype=np.int64),
+                "segment": np.empty(0, dtype=np.int64), "start": np.empty(0)}
+
+    # Segment numbering: global id, and number along the source line (parts of a line follow each other)
+    segment_part = np.repeat(np.arange(len(part_length)), n_segments)
+    number_in_part = np.arange(len(segment_part)) - part_first_segment[segment_part]
+    start = number_in_part * segment_length
+    end = np.minimum(start + segment_length, part_length[segment_part])
+
+    # Points at the cut distances, interpolated between the vertices around them. The key separates
+    # the parts so that a single searchsorted finds the vertex before every cut
+    part_offset = np.cumsum(part_length + 1.0) - (part_length + 1.0)
+    vertex_key = part_offset[vertex_part] + distance
+
+    def interpolate(part, at):
+        before = np.searchsorted(vertex_key, part_offset[part] + at, side="right") - 1
+        before = np.clip(before, first_vertex[part], np.maximum(last_vertex[part] - 1, first_vertex[part]))
+        after = np.minimum(before + 1, last_vertex[part])
+        span = distance[after] - distance[before]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(span > 0, (at - distance[before]) / span, 0.0)
+        return coords[before] + fraction[:, None] * (coords[after] - coords[before])
+
+    start_points = interpolate(segment_part, start)
+    end_points = interpolate(segment_part, end)
+
+    # Inner vertices go to the segment their distance falls in; those right on a cut are already there
+    inner = np.abs(distance / segment_length - np.round(distance / segment_length)) > 1e-9
+    inner[first_vertex] = False
+    inner[last_vertex] = False
+    inner_part = vertex_part[inner]
+    inner_number = np.minimum((distance[inner] / segment_length).astype(np.int64), n_segments[inner_part] - 1)
+    inner_segment = part_first_segment[inner_part] + inner_number
+
+    # All the points of every segment in order along the part, then one linestring per segment
+    n_total = len(segment_part)
+    point_segment = np.concatenate((np.arange(n_total), inner_segment, np.arange(n_total)))
+    point_distance = np.concatenate((start, distance[inner], end))
+    point_coords = np.concatenate((start_points, coords[inner], end_points))
+    order = np.lexsort((point_distance, point_segment))
+    segments = shapely.linestrings(point_coords[order], indices=point_segment[order])
+
+    # Number of every segment along its source line, counting the segments of the previous parts
+    line = table["part_line"][segment_part]
+    line_first_segment = np.searchsorted(line, line)
+    return {"geometry": segments, "line": line, "segment": np.arange(n_total) - line_first_segment,
+            "start": start}
+
+
+def locate_segments(x, y, line, table):
+    """
+    Segment (global id) of the points (x, y) that belong to the lines line: the segment around the
+    point of the line nearest to them. The points are projected on every edge of their line, one
+    edge position at a time over all the points (sorted by the number of edges of their line, so the
+    points still being projected are always a prefix), and the nearest projection is kept.
+    """
+    coords, vertex_part, distance = table["coords"], table["vertex_part"], table["distance"]
+    # Edges (vertex i to i + 1 of the same part) of every line, consecutive in line order
+    edge = np.flatnonzero(vertex_part[:-1] == vertex_part[1:])
+    edge_line = table["part_line"][vertex_part[edge]]
+    line_first_edge = np.searchsorted(edge_line, np.arange(table["n_lines"]))
+    line_edges = np.bincount(edge_line, minlength=table["n_lines"])
+
+    order = np.argsort(-line_edges[line], kind="stable")
+    x, y, line = x[order], y[order], line[order]
+    counts = line_edges[line]
+    active = np.searchsorted(-counts, -np.arange(counts[0] if len(counts) else 0), side="left")
+
+    best = np.full(len(x), np.inf)
+    segment = np.full(len(x), -1, dtype=np.int64)
+    for k, n in enumerate(active):
+        start = edge[line_first_edge[line[:n]] + k]
+        ax, ay = coords[start, 0], coords[start, 1]
+        dx, dy = coords[start + 1, 0] - ax, coords[start + 1, 1] - ay
+        length2 = dx * dx + dy * dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = np.clip(np.where(length2 > 0, ((x[:n] - ax) * dx + (y[:n] - ay) * dy) / length2, 0.0), 0.0, 1.0)
+        d2 = (x[:n] - ax - t * dx) ** 2 + (y[:n] - ay - t * dy) ** 2
+        nearer = d2 < best[:n]
+        part = vertex_part[start]
+        along = distance[start] + t * np.sqrt(length2)
+        number = np.minimum((along / table["segment_length"]).astype(np.int64), table["n_segments"][part] - 1)
+        best[:n] = np.where(nearer, d2, best[:n])
+        segment[:n] = np.where(nearer, table["part_first_segment"][part] + number, segment[:n])
+
+    located = np.empty_like(segment)
+    located[order] = segment
+    return located
+
+
+def calculate_segment_statistics(line_buffers, table, tif_path, tile_size=2048, overlap='shared'):
+    """
+    Mean, pixel count and standard deviation of the canopy raster in every segment.
+
+    The buffers of the whole lines are rasterized (one shape per line, so the work does not grow
+    with the number of segments) tile by tile as in zonal.calculate_zonal_statistics_from_file, and
+    every pixel of a line buffer goes to the segment its centre projects on. The segments of a line
+    therefore split exactly the pixels of its buffer, and the overlap modes work as for the lines.
+    """
+    check_overlap_mode(overlap)
+    line_buffers = np.asarray(line_buffers, dtype=object)
+    layers = assign_non_overlapping_layers(line_buffers) if overlap != 'first' else None
+    sums = empty_zone_sums(int(table["n_segments"].sum()))
+
+    with rasterio.open(tif_path) as src:
+        windows = list(iter_tile_windows(src, tile_size))
+        for tile, idx in match_tiles_to_geometries(line_buffers, windows, src.transform).items():
+            window = windows[tile]
+            transform = src.window_transform(window)
+            values = src.read(1, window=window)
+            pixels, labels, weights = window_zone_pixels(line_buffers, idx, layers, values.shape, transform, overlap)
+            rows, cols = np.divmod(pixels, values.shape[1])
+            x, y = transform * (cols + 0.5, rows + 0.5)
+            segment = locate_segments(np.asarray(x), np.asarray(y), labels - 1, table)
+            accumulate_zone_sums(segment + 1, values.ravel()[pixels], sums, weights)
+
+    return finalize_zone_sums(sums, overlap)
+
+
+def segment_cover_anomalies(line, fc, low=0.5, high=1.5):
+    # Segments whose Canopy Cover is below low times (gaps) or above high times (vigorous patches) the
+    # mean Canopy Cover of their line, with the line mean from one bincount
+    fc = np.asarray(fc, dtype=float)
+    valid = np.isfinite(fc)
+    lines, line = np.unique(line, return_inverse=True)
+    counts = np.bincount(line[valid], minlength=len(lines))
+    sums = np.bincount(line[valid], weights=fc[valid], minlength=len(lines))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        line_mean = (sums / counts)[line]
+    return fc < low * line_mean, fc > high * line_mean
+
+
+def format_segment_summary(segments, segment_length):
+    gaps, vigorous = segment_cover_anomalies(segments["line_id"].to_numpy(), segments["mean_value"].to_numpy())
+    return (
+        f"Segments: {len(segments)} of {segment_length:g} m on {segments['line_id'].nunique()} lines\n"
+        f"Canopy Cover of the segments: mean {segments['mean_value'].mean():.3f}, "
+        f"min {segments['mean_value'].min():.3f}, max {segments['mean_value'].max():.3f}\n"
+        f"Gaps (segments below half the Canopy Cover of their line): {gaps.sum()}\n"
+        f"Vigorous patches (segments above 1.5 times the Canopy Cover of their line): {vigorous.sum()}\n"
+        f"Overuse ratio of the segments: mean {np.nanmean(segments['overuse_ratio'].replace(np.inf, np.nan)):.2f}\n"
+    )
@@ -1,26 +1,19 @@
 import os
 import sys
 import webbrowser
-import numpy as np
-from calc_etc import request_reference_etp, perform_calculations, request_parameters
+from calc_etc import request_reference_etp, request_parameters
 from calc_etp import calculate_et0
 from current_irrigation_network import (
-    calculate_irrigation_need,
     request_irrigation_turn,
-    calculate_net_demand_per_turn,
-    calculate_net_demand_per_hour,
     request_irrigation_hours,
-    calculate_gross_demand,
     request_irrigation_efficiency
 )
-from irrigation_network_efficiency import calculate_overuse_ratio
-from diagrams import create_diagram
-from ratio_label import plot_label
-import matplotlib.pyplot as plt
+from pipeline import calculate_fao_results, calculate_irrigation_results, format_fao_summary, format_irrigation_summary
 from tkinter import simpledialog, Tk, messagebox, filedialog, Label, Button, Toplevel, Text, Scrollbar, END
 from PIL import Image, ImageTk
-import gis
-import pdf_creator
+
+# The GIS (rasterio, geopandas, shapely), PDF (reportlab) and plotting (matplotlib, networkx) stacks
+# are imported inside main() when they are first needed, so the program starts quickly
 
 
 def resource_path(relative_path):
@@ -95,6 +88,25 @@ def confirm_generate_pdf():
     return response
 
 
+def confirm_export_results():
+    root = Tk()
+    root.withdraw()
+    root.attributes("-topmost", True)
+    response = messagebox.askyesno("Export Results",
+                                   "Do you want to export the results as tables (Parquet or CSV)?", parent=root)
+    root.destroy()
+    return response
+
+
+def request_results_directory():
+    root = Tk()
+    root.withdraw()
+    root.attributes("-topmost", True)
+    directory = filedialog.askdirectory(title="Folder for the result tables")
+    root.destroy()
+    return directory
+
+
 def load_image(file_name):
     file_path = resource_path(file_name)
     if os.path.exists(file_path):
@@ -250,6 +262,7 @@ def main():
         fc = request_input("Enter the Canopy Cover CC (suggestion for vineyard: 0.5):")
         tif_path, vector_path, buffer = None, None, None
     elif fc_option == 2:
+        import gis
         coverage_factor, tif_path, vector_path, buffer = gis.obtain_coverage_factor_and_create_buffer(buffer_width)
         if coverage_factor is None or tif_path is None or vector_path is None:
             root = Tk()
@@ -270,80 +283,46 @@ def main():
     pe = request_input("Enter the Effective Precipitation Peff (suggestion: 0):")
     au = request_input("Enter the value of Available Water AW (suggestion most unfavorable: 0):")
 
-    etc, afu, nhn, _ = perform_calculations(et0, kc, pe, au, 1.0)
     eto_percentage = request_input("Enter the % of ET0 to irrigate (enter 1.0 for 100%. vineyard suggestion: 0.3):")
-    nhn_adjusted = nhn * eto_percentage
+    fao_results = calculate_fao_results(et0, kc, fc, pe, au, eto_percentage)
+    etc, nhn, nhn_adjusted = fao_results["etc"], fao_results["nhn"], fao_results["nhn_adjusted"]
 
     # Show FAO data summary
-    fao_data_summary = (
-        f"ET0 (Reference Evapotranspiration): {et0:.2f} mm/day\n"
-        f"ETc (Crop Evapotranspiration): {etc:.2f} mm/day\n"
-        f"Kc (Crop Coefficient): {kc:.2f}\n"
-        f"CC (Canopy Cover): {fc:.2f}\n"
-        f"Peff (Effective Precipitation): {pe:.2f} mm/day\n"
-        f"AW (Available Water): {au:.2f} mm\n"
-        f"RAW (Readily Available Water, 2/3 of AW): {afu:.2f} mm\n"
-        f"NIWR (Net Irrigation Water Requirement): {nhn:.2f} mm/day\n"
-        f"NIWR adjusted (deficit irrigation as % ET0): {nhn_adjusted:.2f} mm/day\n"
-    )
+    fao_data_summary = format_fao_summary(fao_results)
     root = Tk()
     root.withdraw()
     root.attributes("-topmost", True)
     messagebox.showinfo("FAO-56 Penman-Monteith Data Summary", fao_data_summary, parent=root)
     root.destroy()
 
-    # Request irrigation turn and calculate the irrigation need
+    # Request irrigation turn, irrigation hours per day and irrigation system efficiency
     irrigation_turn = request_irrigation_turn()
-    irrigation_need = calculate_irrigation_need(nhn_adjusted, irrigation_turn)
-
-    # Calculate the net water demand per irrigation turn
-    dn_turn = calculate_net_demand_per_turn(nhn_adjusted, fc, irrigation_turn)
-
-    # Request irrigation hours per day
     irrigation_hours = request_irrigation_hours()
-
-    # Calculate the net water demand per hour of irrigation using the coverage factor FC
-    dn_hour = calculate_net_demand_per_hour(dn_turn, irrigation_hours)
-
-    # Request irrigation system efficiency
     irrigation_efficiency = request_irrigation_efficiency()
 
-    # Calculate the gross water demand
-    gross_demand = calculate_gross_demand(dn_hour, irrigation_efficiency)
-
-    # Calculate the net demand per linear meter
-    dn_linear_meter = gross_demand * irrigation_width
-
-    # Calculate liters per dripper
-    liters_per_dripper = dn_linear_meter * dripper_spacing
-
-    # Calculate rounded liters per dripper
-    rounded_liters_per_dripper = np.ceil(liters_per_dripper)
-
-    # Calculate the overuse ratio of resources
-    overuse_ratio = calculate_overuse_ratio(dripper_flow, liters_per_dripper)
+    # Calculate the irrigation need, net and gross demands, ideal liters per dripper and overuse ratio
+    irrigation_results = calculate_irrigation_results(nhn_adjusted, fc, irrigation_turn, irrigation_hours,
+                                                      irrigation_efficiency, dripper_flow, dripper_spacing,
+                                                      irrigation_width)
+    irrigation_need = irrigation_results["irrigation_need"]
+    dn_turn = irrigation_results["dn_turn"]
+    dn_hour = irrigation_results["dn_hour"]
+    gross_demand = irrigation_results["gross_demand"]
+    liters_per_dripper = irrigation_results["liters_per_dripper"]
+    overuse_ratio = irrigation_results["overuse_ratio"]
 
     # Show irrigation data summary
-    irrigation_data_summary = (
-        f"The irrigation need for an interval of {irrigation_turn} day(s) is: {irrigation_need:.2f} mm/{irrigation_turn} day(s)\n"
-        f"NIWR adjusted per irrigation interval: {dn_turn:.2f} l/(m2*{irrigation_turn} days)\n"
-        f"NIWR adjusted per irrigation hours: {dn_hour:.2f} l/(h*m2)\n"
-        f"GIWR (Gross Irrigation Water Requirement) during {irrigation_hours} hours of irrigation: {gross_demand:.2f} l/(h*m2)\n"
-        f"Ideal liters per dripper: {liters_per_dripper:.2f} l/(h)\n"
-        f"Rounded ideal liters per dripper: {rounded_liters_per_dripper:.2f} l/(h)\n"
-        f"Real dripper flow rate: {dripper_flow:.2f} L/h\n"
-        f"CC (Canopy Cover): {fc:.2f}\n"
-        f"Effective irrigation width of the dripper: {irrigation_width:.2f} m\n"
-        f"Buffer width: {buffer_width:.2f} m\n"
-        f"Irrigation hours per interval: {irrigation_hours}\n"
-        f"Distance between drippers: {dripper_spacing:.2f} m\n"
-    )
+    irrigation_data_summary = format_irrigation_summary(irrigation_results)
     root = Tk()
     root.withdraw()
     root.attributes("-topmost", True)
     messagebox.showinfo("Irrigation Data Summary", irrigation_data_summary, parent=root)
     root.destroy()
 
+    import matplotlib.pyplot as plt
+    from diagrams import create_diagram
+    from ratio_label import plot_label
+
     # Create the diagram with the calculated values
     fig1, ax1 = create_diagram(et0, etc, nhn, nhn_adjusted, irrigation_need, dn_turn, dn_hour, gross_demand,
                                irrigation_turn,
@@ -358,9 +337,10 @@ def main():
     # Generate the new map if GIS maps have been entered
     fig_ideal_liters, fig_rounded_ideal_liters, fig_overuse_ratio = None, None, None
     if fc_option == 2 and tif_path and vector_path:
-        fig_ideal_liters = gis.generate_ideal_liters_per_dripper_map(buffer, liters_per_dripper, fc)
+        gis.add_line_metrics(buffer, liters_per_dripper, fc, dripper_flow)
+        fig_ideal_liters = gis.generate_ideal_liters_per_dripper_map(buffer)
         fig_rounded_ideal_liters = gis.generate_rounded_ideal_liters_map(buffer)
-        fig_overuse_ratio = gis.generate_overuse_ratio_map(buffer, dripper_flow)
+        fig_overuse_ratio = gis.generate_overuse_ratio_map(buffer)
 
     # Confirm if you want to generate the PDF
     if confirm_generate_pdf():
@@ -386,8 +366,12 @@ def main():
 
                 # Create PDF with the results and charts
                 print("Saving PDF...")
-                dem_data = gis.read_dem(tif_path)[0] if tif_path else None
-                vector_data = gis.read_vector_layer(vector_path) if vector_path else None
+                import pdf_creator
+                dem_data, vector_data = None, None
+                if tif_path and vector_path:
+                    import gis
+                    dem_data = gis.read_overview(tif_path)[0]
+                    vector_data = gis.read_vector_layer(vector_path)
 
                 pdf_creator.save_plots_and_create_pdf(
                     fao_data_summary, irrigation_data_summary, "images/kawaii_water_drop.jpg",
@@ -412,6 +396,21 @@ def main():
     else:
         print("The PDF report will not be generated.")
 
+    # Export the global and per-line results as tables for later analysis
+    if confirm_export_results():
+        results_dir = request_results_directory()
+        if results_dir:
+            import results_export
+            try:
+                result_format = "parquet"
+                results_export.check_results_format(result_format)
+            except ImportError:
+                result_format = "csv"  # pyarrow is not installed
+            lines = gis.read_vector_layer(vector_path).geometry if buffer is not None else None
+            results_export.write_results({**fao_results, **irrigation_results, "assigned_letter": assigned_letter},
+                                         buffer, results_dir, result_format, lines=lines)
+            print(f"Results exported to: {results_dir}")
+
     show_end_message()
 
 
@@ -0,0 +1,82 @@
+"""
+Search the dripper flow, dripper spacing, irrigation hours and irrigation turn that reach a target
+label with the least water.
+
+Every combination of the candidate values is evaluated at once on a broadcast grid with the same
+chain as the interactive program (pipeline.calculate_irrigation_results). A configuration is valid
+when its letter is the target or better and the drippers give at least the ideal liters
+(overuse ratio >= 0, otherwise the crop would be under-irrigated). The water applied per day is
+then proportional to 1 + overuse ratio, and the Pareto set keeps the valid configurations for which
+no other one uses less water with fewer irrigation hours.
+"""
+import numpy as np
+import pandas as pd
+
+from irrigation_network_efficiency import DRIPPER_CATALOG as DRIPPER_FLOWS, DRIPPER_SPACINGS
+from pipeline import calculate_irrigation_results
+from label_letters import LABELS, assign_letter_indices
+
+IRRIGATION_HOURS = tuple(np.arange(1, 24.5, 0.5))
+IRRIGATION_TURNS = (1, 2, 3, 7)
+
+
+def evaluate_grid(nhn_adjusted, fc, irrigation_efficiency, irrigation_width, dripper_flows=DRIPPER_FLOWS,
+                  dripper_spacings=DRIPPER_SPACINGS, irrigation_hours=IRRIGATION_HOURS,
+                  irrigation_turns=IRRIGATION_TURNS):
+    # Broadcast the candidates on four axes (flow, spacing, hours, turn) and run the chain once
+    flow = np.asarray(dripper_flows, dtype=float)[:, None, None, None]
+    spacing = np.asarray(dripper_spacings, dtype=float)[None, :, None, None]
+    hours = np.asarray(irrigation_hours, dtype=float)[None, None, :, None]
+    turn = np.asarray(irrigation_turns)[None, None, None, :]
+    results = calculate_irrigation_results(nhn_adjusted, fc, turn, hours, irrigation_efficiency, flow, spacing,
+                                           irrigation_width)
+
+    shape = np.broadcast_shapes(flow.shape, spacing.shape, hours.shape, turn.shape)
+    grid = {name: np.broadcast_to(values, shape).ravel()
+            for name, values in (("dripper_flow", flow), ("dripper_spacing", spacing), ("irrigation_hours", hours),
+                                 ("irrigation_turn", turn))}
+    grid["liters_per_dripper"] = np.broadcast_to(results["liters_per_dripper"], shape).ravel()
+    grid["overuse_ratio"] = np.broadcast_to(results["overuse_ratio"], shape).ravel()
+    # Gross water applied per day (mm = l/m2 of the wetted strip, per day of the turn)
+    grid["water_per_day"] = grid["dripper_flow"] * grid["irrigation_hours"] / (
+            grid["dripper_spacing"] * irrigation_width * grid["irrigation_turn"])
+    return grid
+
+
+def pareto_front(water, hours):
+    # Indices of the configurations not dominated in (water, hours): sorted by water (then hours),
+    # a configuration is kept only if it needs fewer hours than every cheaper one
+    order = np.lexsort((hours, water))
+    sorted_hours = hours[order]
+    best_before = np.concatenate(([np.inf], np.minimum.accumulate(sorted_hours)[:-1]))
+    return order[sorted_hours < best_before]
+
+
+def optimize_installation(nhn_adjusted, fc, irrigation_efficiency, irrigation_width, target_letter="A",
+                          dripper_flows=DRIPPER_FLOWS, dripper_spacings=DRIPPER_SPACINGS,
+                          irrigation_hours=IRRIGATION_HOURS, irrigation_turns=IRRIGATION_TURNS):
+    """Pareto set (least water, fewest hours) of the configurations reaching target_letter, as a DataFrame."""
+    if target_letter not in LABELS:
+        raise ValueError(f"Unknown label letter: {target_letter} (use one of {', '.join(LABELS)})")
+    grid = evaluate_grid(nhn_adjusted, fc, irrigation_efficiency, irrigation_width, dripper_flows,
+                         dripper_spacings, irrigation_hours, irrigation_turns)
+
+    letter_indices = assign_letter_indices(grid["overuse_ratio"])
+    valid = (letter_indices <= LABELS.index(target_letter)) & (grid["overuse_ratio"] >= 0)
+    valid_indices = np.flatnonzero(valid)
+    front = valid_indices[pareto_front(grid["water_per_day"][valid], grid["irrigation_hours"][valid])]
+
+    table = pd.DataFrame({name: values[front] for name, values in grid.items()})
+    table["assigned_letter"] = np.asarray(LABELS)[letter_indices[front]]
+    return table.reset_index(drop=True)
+
+
+def format_optimization_summary(table, target_letter):
+    if table.empty:
+        return f"No configuration of the candidates reaches the label {target_letter}\n"
+    lines = [f"Configurations reaching the label {target_letter} with the least water (Pareto set):"]
+    for row in table.itertuples():
+        lines.append(f"{row.dripper_flow:.1f} L/h every {row.dripper_spacing:.2f} m, {row.irrigation_hours:g} h "
+                     f"every {row.irrigation_turn} day(s): {row.water_per_day:.2f} l/m2/day, "
+                     f"overuse ratio {row.overuse_ratio:.2f} ({row.assigned_letter})")
+    return "\n".join(lines) + "\n"
@@ -1,35 +1,86 @@
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
 import matplotlib.pyplot as plt
 import io
 import os
 from PIL import Image
 from tkinter import filedialog, Tk
-
-def save_plot_to_image(fig, description):
-    image_path = f"{description}.png"
-    fig.savefig(image_path, format='png')
-    return image_path
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing
+
+try:
+    from svglib.svglib import svg2rlg
+except ImportError:  # svglib is optional: without it the maps are always embedded as PNG
+    svg2rlg = None
+
+# Label images are looked up next to this module so reports can be created from any working directory
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# Page layout of figures is computed as if they were rendered at matplotlib's default resolution,
+# so changing the export DPI or embedding them as vector drawings does not change their size on the page
+LAYOUT_DPI = 100
+
+def save_plot_to_image(fig, map_format='raster', dpi=None):
+    # Render the figure in memory so no temporary files are written to the working directory.
+    # 'vector' returns a reportlab drawing (needs svglib), 'raster' a PNG at the given DPI
+    if map_format == 'vector':
+        if svg2rlg is not None:
+            svg = io.BytesIO()
+            fig.savefig(svg, format='svg')
+            svg.seek(0)
+            return svg2rlg(svg)
+        print("Warning: svglib is not installed, the maps will be embedded as PNG images.")
+
+    image = io.BytesIO()
+    if dpi:
+        fig.savefig(image, format='png', dpi=dpi)
+    else:
+        fig.savefig(image, format='png')
+    image.seek(0)
+    return image
+
+def get_image_size(image_path):
+    # Size used for the page layout, in pixels at LAYOUT_DPI for in-memory figures
+    if isinstance(image_path, Drawing):
+        return image_path.width * LAYOUT_DPI / 72, image_path.height * LAYOUT_DPI / 72, None
+    if hasattr(image_path, 'seek'):
+        image_path.seek(0)
+    img = Image.open(image_path)
+    width, height = img.width, img.height
+    if hasattr(image_path, 'seek') and 'dpi' in img.info:
+        width = width * LAYOUT_DPI / img.info['dpi'][0]
+        height = height * LAYOUT_DPI / img.info['dpi'][1]
+    return width, height, img
 
 def add_image_to_pdf(c, image_path, page_width, page_height, margin, scale=0.7, overuse_ratio=None):
+    # image_path is a file path, or an in-memory PNG or vector drawing created by save_plot_to_image
     try:
-        img = Image.open(image_path)
-        aspect = img.width / img.height
+        img_width, img_height, img = get_image_size(image_path)
+        aspect = img_width / img_height
         max_width = page_width - 2 * margin
         max_height = page_height / 2  # Limit the height to half of the page
 
         if aspect > 1:
-            width = min(max_width, img.width * scale)  # Scale of max width
+            width = min(max_width, img_width * scale)  # Scale of max width
             height = width / aspect
         else:
-            height = min(max_height, img.height * scale)  # Scale of max height
+            height = min(max_height, img_height * scale)  # Scale of max height
             width = height * aspect
 
         x = (page_width - width) / 2
         y = (page_height - height) / 2  # Place the image in the middle of the page
 
-        c.drawImage(image_path, x, y, width, height, preserveAspectRatio=True, mask='auto')
+        if img is None:
+            # Vector drawing: scale it to the reserved box and draw it natively
+            c.saveState()
+            c.translate(x, y)
+            c.scale(width / image_path.width, height / image_path.height)
+            renderPDF.draw(image_path, c, 0, 0)
+            c.restoreState()
+        else:
+            c.drawImage(ImageReader(img), x, y, width, height, preserveAspectRatio=True, mask='auto')
 
         # Add overuse ratio text above the label
         if overuse_ratio is not None:
@@ -91,7 +142,7 @@ def create_cover(c, image_path, page_width, page_height, margin):
     draw_frame(c, margin, margin, page_width - 2 * margin, page_height - 2 * margin)  # Draw the frame last
     c.showPage()
 
-def create_pdf(partial_results, final_results, cover_image_path, dem_image_path, vector_image_path, diagram_image_path, label_image_path, filename, fig_ideal_liters=None, fig_rounded_ideal_liters=None, fig_overuse_ratio=None, label_A_image_path=None, overuse_ratio=None, assigned_letter=None):
+def create_pdf(partial_results, final_results, cover_image_path, dem_image_path, vector_image_path, diagram_image_path, label_image_path, filename, fig_ideal_liters=None, fig_rounded_ideal_liters=None, fig_overuse_ratio=None, label_A_image_path=None, overuse_ratio=None, assigned_letter=None, interactive=True, map_format='raster', dpi=None):
     c = canvas.Canvas(filename, pagesize=letter)
     page_width, page_height = letter
     margin = 0.5 * inch
@@ -162,26 +213,26 @@ def create_pdf(partial_results, final_results, cover_image_path, dem_image_path,
 
     # Add the new figures
     if fig_ideal_liters:
-        fig_ideal_liters_path = save_plot_to_image(fig_ideal_liters, "ideal_liters")
+        fig_ideal_liters_path = save_plot_to_image(fig_ideal_liters, map_format, dpi)
         add_image_page(fig_ideal_liters_path, "Ideal Liters per Dripper Map", "This map shows the ideal liters per dripper for each irrigation line.")
     if fig_rounded_ideal_liters:
-        fig_rounded_ideal_liters_path = save_plot_to_image(fig_rounded_ideal_liters, "rounded_ideal_liters")
+        fig_rounded_ideal_liters_path = save_plot_to_image(fig_rounded_ideal_liters, map_format, dpi)
         add_image_page(fig_rounded_ideal_liters_path, "Rounded Ideal Liters Map", "This map shows the rounded ideal liters per dripper for each irrigation line.")
     if fig_overuse_ratio:
-        fig_overuse_ratio_path = save_plot_to_image(fig_overuse_ratio, "overuse_ratio")
+        fig_overuse_ratio_path = save_plot_to_image(fig_overuse_ratio, map_format, dpi)
         add_image_page(fig_overuse_ratio_path, "Overuse Ratio Map", "This map shows the overuse ratio for each irrigation line. The values are in % times more irrigation.")
 
     # Select the label image based on the assigned letter
     label_image_map = {
-        "A+++": "images/label_A+++.jpg",
-        "A++": "images/label_A++.jpg",
-        "A+": "images/label_A+.jpg",
-        "A": "images/label_A.jpg",
-        "B": "images/label_B.jpg",
-        "C": "images/label_C.jpg",
-        "D": "images/label_D.jpg"
+        "A+++": os.path.join(IMAGES_DIR, "label_A+++.jpg"),
+        "A++": os.path.join(IMAGES_DIR, "label_A++.jpg"),
+        "A+": os.path.join(IMAGES_DIR, "label_A+.jpg"),
+        "A": os.path.join(IMAGES_DIR, "label_A.jpg"),
+        "B": os.path.join(IMAGES_DIR, "label_B.jpg"),
+        "C": os.path.join(IMAGES_DIR, "label_C.jpg"),
+        "D": os.path.join(IMAGES_DIR, "label_D.jpg")
     }
-    label_A_image_path = label_image_map.get(assigned_letter, "images/label_A.jpg")
+    label_A_image_path = label_image_map.get(assigned_letter, os.path.join(IMAGES_DIR, "label_A.jpg"))
 
     if label_A_image_path:
         add_image_page(label_A_image_path, "Efficiency label", "This figure shows the Efficiency label for this facility.", scale=0.56, overuse_ratio=overuse_ratio, assigned_letter=assigned_letter)
@@ -190,10 +241,12 @@ def create_pdf(partial_results, final_results, cover_image_path, dem_image_path,
         c.save()
         print(f"PDF saved at: {filename}")
     except PermissionError:
+        if not interactive:
+            raise
         print(f"Error: Could not save the file {filename}. It is open or there is no permission.")
         new_save_path = request_new_save_path()
         if new_save_path:
-            create_pdf(partial_results, final_results, cover_image_path, dem_image_path, vector_image_path, diagram_image_path, label_image_path, new_save_path, fig_ideal_liters, fig_rounded_ideal_liters, fig_overuse_ratio, label_A_image_path, overuse_ratio, assigned_letter)
+            create_pdf(partial_results, final_results, cover_image_path, dem_image_path, vector_image_path, diagram_image_path, label_image_path, new_save_path, fig_ideal_liters, fig_rounded_ideal_liters, fig_overuse_ratio, label_A_image_path, overuse_ratio, assigned_letter, interactive, map_format, dpi)
 
 def wrap_text(text, width, c):
     words = text.split()
@@ -218,9 +271,8 @@ def request_new_save_path():
     root.destroy()
     return save_path
 
-def save_plots_and_create_pdf(partial_results, final_results, cover_image_path, dem=None, vector_layer=None, diagram_image=None, label_image=None, pdf_filename=None, fig_ideal_liters=None, fig_rounded_ideal_liters=None, fig_overuse_ratio=None, label_A_image_path=None, overuse_ratio=None, assigned_letter=None):
+def save_plots_and_create_pdf(partial_results, final_results, cover_image_path, dem=None, vector_layer=None, diagram_image=None, label_image=None, pdf_filename=None, fig_ideal_liters=None, fig_rounded_ideal_liters=None, fig_overuse_ratio=None, label_A_image_path=None, overuse_ratio=None, assigned_letter=None, interactive=True, map_format='raster', dpi=None):
     dem_image_path = vector_image_path = None
-    fig_ideal_liters_path = fig_rounded_ideal_liters_path = fig_overuse_ratio_path = None
 
     # Create figure for DEM
     if dem is not None:
@@ -234,7 +286,7 @@ def save_plots_and_create_pdf(partial_results, final_results, cover_image_path,
         cax1 = ax1.imshow(dem_values, cmap='viridis', vmin=min_val, vmax=max_val)
         fig1.colorbar(cax1, ax=ax1, label='Elevation')
         ax1.set_title('Canopy Height Model (CHM)')
-        dem_image_path = save_plot_to_image(fig1, "dem_image")
+        dem_image_path = save_plot_to_image(fig1, 'raster', dpi)  # Always raster: the CHM is an image
         plt.close(fig1)
 
     # Create figure for vector layer
@@ -242,24 +294,20 @@ def save_plots_and_create_pdf(partial_results, final_results, cover_image_path,
         fig2, ax2 = plt.subplots(figsize=(10, 8))
         vector_layer.plot(ax=ax2, color='orange')
         ax2.set_title('Irrigation Network')
-        vector_image_path = save_plot_to_image(fig2, "vector_image")
+        vector_image_path = save_plot_to_image(fig2, map_format, dpi)
         plt.close(fig2)
 
     # Save additional images
-    diagram_image_path = save_plot_to_image(diagram_image, "diagram_image") if diagram_image else None
-    label_image_path = save_plot_to_image(label_image, "label_image") if label_image else None
-
-    # Save images and create PDF
+    diagram_image_path = save_plot_to_image(diagram_image, map_format, dpi) if diagram_image else None
+    # The label can be a figure or an image already written by ratio_label.LabelRenderer
+    if hasattr(label_image, 'savefig'):
+        label_image_path = save_plot_to_image(label_image, map_format, dpi)
+    else:
+        label_image_path = label_image
+
+    # Create the PDF from the in-memory images
     create_pdf(
         partial_results, final_results, cover_image_path, dem_image_path, vector_image_path,
-        diagram_image_path, label_image_path, pdf_filename, fig_ideal_liters, fig_rounded_ideal_liters, fig_overuse_ratio, label_A_image_path, overuse_ratio, assigned_letter
+        diagram_image_path, label_image_path, pdf_filename, fig_ideal_liters, fig_rounded_ideal_liters, fig_overuse_ratio, label_A_image_path, overuse_ratio, assigned_letter,
+        interactive, map_format, dpi
     )
-
-    # Delete temporary images
-    for path in [dem_image_path, vector_image_path, diagram_image_path, label_image_path, fig_ideal_liters_path, fig_rounded_ideal_liters_path, fig_overuse_ratio_path]:
-        if path:
-            try:
-                os.remove(path)
-            except OSError as e:
-                print(f"Error: Could not delete the file {path}. {e}")
-
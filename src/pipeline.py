@@ -0,0 +1,105 @@
+import numpy as np
+from calc_etc import perform_calculations
+from current_irrigation_network import (
+    calculate_irrigation_need,
+    calculate_net_demand_per_turn,
+    calculate_net_demand_per_hour,
+    calculate_gross_demand
+)
+from irrigation_network_efficiency import calculate_overuse_ratio
+
+
+def calculate_fao_results(et0, kc, fc, pe, au, eto_percentage):
+    """FAO-56 water requirements shown in the 'FAO-56 Penman-Monteith Data Summary'."""
+    etc, afu, nhn, nhn_adjusted = perform_calculations(et0, kc, pe, au, eto_percentage)
+    return {
+        "et0": et0,
+        "etc": etc,
+        "kc": kc,
+        "fc": fc,
+        "pe": pe,
+        "au": au,
+        "afu": afu,
+        "nhn": nhn,
+        "eto_percentage": eto_percentage,
+        "nhn_adjusted": nhn_adjusted,
+    }
+
+
+def calculate_irrigation_results(nhn_adjusted, fc, irrigation_turn, irrigation_hours, irrigation_efficiency,
+                                 dripper_flow, dripper_spacing, irrigation_width):
+    """Irrigation demand, ideal liters per dripper and overuse ratio of the current installation."""
+    # Calculate the irrigation need for the irrigation turn
+    irrigation_need = calculate_irrigation_need(nhn_adjusted, irrigation_turn)
+
+    # Calculate the net water demand per irrigation turn
+    dn_turn = calculate_net_demand_per_turn(nhn_adjusted, fc, irrigation_turn)
+
+    # Calculate the net water demand per hour of irrigation using the coverage factor FC
+    dn_hour = calculate_net_demand_per_hour(dn_turn, irrigation_hours)
+
+    # Calculate the gross water demand
+    gross_demand = calculate_gross_demand(dn_hour, irrigation_efficiency)
+
+    # Calculate the net demand per linear meter
+    dn_linear_meter = gross_demand * irrigation_width
+
+    # Calculate liters per dripper
+    liters_per_dripper = dn_linear_meter * dripper_spacing
+
+    # Calculate rounded liters per dripper
+    rounded_liters_per_dripper = np.ceil(liters_per_dripper)
+
+    # Calculate the overuse ratio of resources
+    overuse_ratio = calculate_overuse_ratio(dripper_flow, liters_per_dripper)
+
+    return {
+        "fc": fc,
+        "irrigation_turn": irrigation_turn,
+        "irrigation_hours": irrigation_hours,
+        "irrigation_efficiency": irrigation_efficiency,
+        "irrigation_need": irrigation_need,
+        "dn_turn": dn_turn,
+        "dn_hour": dn_hour,
+        "gross_demand": gross_demand,
+        "dn_linear_meter": dn_linear_meter,
+        "liters_per_dripper": liters_per_dripper,
+        "rounded_liters_per_dripper": rounded_liters_per_dripper,
+        "dripper_flow": dripper_flow,
+        "dripper_spacing": dripper_spacing,
+        "irrigation_width": irrigation_width,
+        "buffer_width": irrigation_width / 2,
+        "overuse_ratio": overuse_ratio,
+    }
+
+
+def format_fao_summary(results):
+    return (
+        f"ET0 (Reference Evapotranspiration): {results['et0']:.2f} mm/day\n"
+        f"ETc (Crop Evapotranspiration): {results['etc']:.2f} mm/day\n"
+        f"Kc (Crop Coefficient): {results['kc']:.2f}\n"
+        f"CC (Canopy Cover): {results['fc']:.2f}\n"
+        f"Peff (Effective Precipitation): {results['pe']:.2f} mm/day\n"
+        f"AW (Available Water): {results['au']:.2f} mm\n"
+        f"RAW (Readily Available Water, 2/3 of AW): {results['afu']:.2f} mm\n"
+        f"NIWR (Net Irrigation Water Requirement): {results['nhn']:.2f} mm/day\n"
+        f"NIWR adjusted (deficit irrigation as % ET0): {results['nhn_adjusted']:.2f} mm/day\n"
+    )
+
+
+def format_irrigation_summary(results):
+    irrigation_turn = results['irrigation_turn']
+    return (
+        f"The irrigation need for an interval of {irrigation_turn} day(s) is: {results['irrigation_need']:.2f} mm/{irrigation_turn} day(s)\n"
+        f"NIWR adjusted per irrigation interval: {results['dn_turn']:.2f} l/(m2*{irrigation_turn} days)\n"
+        f"NIWR adjusted per irrigation hours: {results['dn_hour']:.2f} l/(h*m2)\n"
+        f"GIWR (Gross Irrigation Water Requirement) during {results['irrigation_hours']} hours of irrigation: {results['gross_demand']:.2f} l/(h*m2)\n"
+        f"Ideal liters per dripper: {results['liters_per_dripper']:.2f} l/(h)\n"
+        f"Rounded ideal liters per dripper: {results['rounded_liters_per_dripper']:.2f} l/(h)\n"
+        f"Real dripper flow rate: {results['dripper_flow']:.2f} L/h\n"
+        f"CC (Canopy Cover): {results['fc']:.2f}\n"
+        f"Effective irrigation width of the dripper: {results['irrigation_width']:.2f} m\n"
+        f"Buffer width: {results['buffer_width']:.2f} m\n"
+        f"Irrigation hours per interval: {results['irrigation_hours']}\n"
+        f"Distance between drippers: {results['dripper_spacing']:.2f} m\n"
+    )
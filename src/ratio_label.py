@@ -1,44 +1,116 @@
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib import colormaps
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
 
-def plot_label(overuse_ratio):
-    labels = ["A+++", "A++", "A+", "A", "B", "C", "D"]
-    value_ranges = [5, 15, 30, 50, 80, 150, 300]  # Adjust the upper limit for each range
-    colors = plt.cm.RdYlGn_r(np.linspace(0, 1, len(labels)))  # Colors from green to red
+from label_letters import LABELS, VALUE_RANGES, assign_letter, assign_letter_indices, assign_letters  # noqa: F401
+
+
+def _ratio_marker(overuse_ratio):
+    # Position and text of the ratio marker drawn over the bars
+    if overuse_ratio < 5:
+        return overuse_ratio, f"<5"
+    elif overuse_ratio > 150:
+        return 150, f">150"
+    return overuse_ratio, f'{overuse_ratio:.2f}'
 
-    fig, ax = plt.subplots(figsize=(10, 8))
 
-    for i, (label, value, color) in enumerate(zip(labels, value_ranges, colors)):
+def _draw_bars(ax, colors):
+    for i, (label, value, color) in enumerate(zip(LABELS, VALUE_RANGES, colors)):
         ax.barh(label, value, color=color, edgecolor='black')
+    ax.set_yticks(np.arange(len(LABELS)))
+    ax.set_yticklabels(LABELS)
+    ax.set_xlim(0, 300)  # Adjust the maximum limit to fit the ranges
+    ax.invert_yaxis()
+    ax.set_xlabel('Ratio')
+    ax.set_ylabel('Resource Use Efficiency')
+    ax.set_title('Resource Overuse Ratio Label')
+
+
+def plot_label(overuse_ratio):
+    colors = plt.cm.RdYlGn_r(np.linspace(0, 1, len(LABELS)))  # Colors from green to red
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    _draw_bars(ax, colors)
 
     # Determine the appropriate range for the overuse ratio
-    if overuse_ratio < 5:
-        value_ratio = overuse_ratio
-        ratio_label = f"<5"
-        idx = 0
-    elif overuse_ratio > 150:
-        value_ratio = 150
-        ratio_label = f">150"
-        idx = len(labels) - 1
-    else:
-        value_ratio = overuse_ratio
-        ratio_label = f'{overuse_ratio:.2f}'
-        idx = np.digitize(overuse_ratio, value_ranges) - 1
+    value_ratio, ratio_label = _ratio_marker(overuse_ratio)
+    idx = int(assign_letter_indices(overuse_ratio))
 
     color_value = colors[idx]
-    assigned_letter = labels[idx]
+    assigned_letter = LABELS[idx]
     ax.axvline(x=value_ratio, color=color_value, linewidth=3)
-    ax.text(value_ratio + 1, len(labels) - idx - 1, ratio_label, va='center', ha='left', color=color_value, fontsize=12, fontweight='bold')
+    ax.text(value_ratio + 1, len(LABELS) - idx - 1, ratio_label, va='center', ha='left', color=color_value, fontsize=12, fontweight='bold')
 
-    ax.set_yticks(np.arange(len(labels)))
-    ax.set_yticklabels(labels)
-    ax.set_xlim(0, 300)  # Adjust the maximum limit to fit the ranges
-    ax.invert_yaxis()
-    plt.xlabel('Ratio')
-    plt.ylabel('Resource Use Efficiency')
-    plt.title('Resource Overuse Ratio Label')
     plt.tight_layout()
     return fig, ax, assigned_letter
 
+
+class LabelRenderer:
+    """
+    Label renderer for batches: the bar chart is built and rasterized once, and each call only
+    stamps the ratio marker and its text before writing the file.
+
+    The figure is not registered with pyplot, so nothing accumulates across thousands of calls.
+    PNG output blits the marker over the cached background; any other format (SVG, PDF) reuses
+    the same figure and is saved with savefig.
+    """
+
+    def __init__(self, figsize=(10, 8), dpi=100):
+        self.colors = colormaps['RdYlGn_r'](np.linspace(0, 1, len(LABELS)))  # Colors from green to red
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        _draw_bars(self.ax, self.colors)
+        self.figure.tight_layout()
+
+        self.marker = self.ax.axvline(x=0, linewidth=3, visible=False)
+        self.text = self.ax.text(0, 0, "", va='center', ha='left', fontsize=12, fontweight='bold', visible=False)
+
+        # Rasterize the static chart once; the marker is hidden so it is not part of the background
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+
+    def _stamp(self, overuse_ratio):
+        value_ratio, ratio_label = _ratio_marker(overuse_ratio)
+        idx = int(assign_letter_indices(overuse_ratio))
+        color_value = self.colors[idx]
+
+        self.marker.set_xdata([value_ratio, value_ratio])
+        self.marker.set_color(color_value)
+        self.text.set_position((value_ratio + 1, len(LABELS) - idx - 1))
+        self.text.set_text(ratio_label)
+        self.text.set_color(color_value)
+        return LABELS[idx]
+
+    def render(self, overuse_ratio, path, image_format=None):
+        """Write the label for overuse_ratio to path (format from the extension) and return the letter."""
+        assigned_letter = self._stamp(overuse_ratio)
+        image_format = (image_format or path.rsplit('.', 1)[-1]).lower()
+
+        if image_format == 'png':
+            self.canvas.restore_region(self.background)
+            self.marker.set_visible(True)
+            self.text.set_visible(True)
+            self.ax.draw_artist(self.marker)
+            self.ax.draw_artist(self.text)
+            self.marker.set_visible(False)
+            self.text.set_visible(False)
+            width, height = self.canvas.get_width_height()
+            Image.frombuffer("RGBA", (width, height), self.canvas.buffer_rgba(), "raw", "RGBA", 0, 1).save(path)
+        else:
+            self.marker.set_visible(True)
+            self.text.set_visible(True)
+            self.figure.savefig(path, format=image_format)
+            self.marker.set_visible(False)
+            self.text.set_visible(False)
+            # savefig redraws the whole canvas; put the cached background back for the next PNG
+            self.canvas.restore_region(self.background)
+
+        return assigned_letter
+
+
 if __name__ == "__main__":
     plt.show()
@@ -0,0 +1,104 @@
+"""
+Write the ecolabel results as tables, so they can be analysed without reading the PDF.
+
+Two tables are written for a plot:
+    plot_results.<ext>  one row with the global values (ET0, ETc, NIWR, gross demand, overuse ratio, letter...)
+    line_results.<ext>  one row per irrigation line (length, canopy cover and the per-line metrics)
+
+and, with a segment analysis, segment_results.<ext> with one row per segment of every line.
+
+Formats: "parquet" (GeoParquet, keeping the geometry; needs pyarrow) or "csv" (the geometry is
+written as WKT). line_results keeps the irrigation lines themselves when they are given, and the
+buffer polygons otherwise; segment_results keeps the buffer polygons of the segments.
+"""
+import os
+
+import pandas as pd
+
+RESULT_FORMATS = ("parquet", "csv")
+PLOT_FIELDS = ("et0", "etc", "kc", "fc", "pe", "au", "afu", "nhn", "eto_percentage", "nhn_adjusted",
+               "irrigation_turn", "irrigation_hours", "irrigation_efficiency", "irrigation_need", "dn_turn",
+               "dn_hour", "gross_demand", "dn_linear_meter", "liters_per_dripper", "rounded_liters_per_dripper",
+               "dripper_flow", "dripper_spacing", "irrigation_width", "buffer_width", "overuse_ratio",
+               "assigned_letter")
+LINE_FIELDS = ("length", "mean_value", "pixel_count", "std_value", "ideal_liters", "rounded_ideal_liters",
+               "overuse_ratio", "recommended_flow", "recommended_spacing", "sized_overuse_ratio", "delivered_flow",
+               "emission_uniformity", "hydraulic_overuse_ratio", "network_role", "network_parent", "network_depth",
+               "required_flow", "irrigation_time", "sector")
+SEGMENT_FIELDS = ("line_id", "segment", "start", "length", "mean_value", "pixel_count", "std_value", "ideal_liters",
+                  "rounded_ideal_liters", "overuse_ratio")
+
+
+def check_results_format(result_format):
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"Unknown results format: {result_format} (use one of {', '.join(RESULT_FORMATS)})")
+    if result_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("pyarrow is required to write Parquet files (pip install pyarrow)")
+
+
+def plot_results_table(results, name=None):
+    """One-row table with the global values of a plot (any field missing from results is left out)."""
+    row = {field: results[field] for field in PLOT_FIELDS if field in results}
+    if name is not None:
+        row = {"name": name, **row}
+    return pd.DataFrame([row])
+
+
+def line_results_table(buffer, name=None, geometry=True, lines=None):
+    """
+    Per-line table from the buffer layer, indexed by line_id (the feature id in the network layer).
+    With lines (the GeoSeries of the network layer) the line geometry is written instead of the buffer.
+    """
+    table = buffer[[field for field in LINE_FIELDS if field in buffer.columns]].copy()
+    if name is not None:
+        table.insert(0, "name", name)
+    if geometry and lines is not None:
+        table = lines.rename("geometry").to_frame().join(table)
+    elif geometry:
+        table = buffer[[buffer.geometry.name]].join(table)
+    return table.rename_axis("line_id").reset_index()
+
+
+def segment_results_table(segments, name=None, geometry=True):
+    """Per-segment table (line_id and segment number along the line) from the segment buffer layer."""
+    table = segments[[field for field in SEGMENT_FIELDS if field in segments.columns]].copy()
+    if name is not None:
+        table.insert(0, "name", name)
+    if geometry:
+        table = segments[[segments.geometry.name]].join(table)
+    return table.reset_index(drop=True)
+
+
+def write_table(table, path):
+    """Write a table to .parquet or .csv, chosen by the extension of path."""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    check_results_format(extension)
+    has_geometry = hasattr(table, "geometry") and table.geometry.name in table.columns
+    if extension == "parquet":
+        # GeoDataFrames are written as GeoParquet (geometry as WKB plus its CRS)
+        table.to_parquet(path, index=False)
+    else:
+        if has_geometry:
+            table = pd.DataFrame(table).assign(**{table.geometry.name: table.geometry.to_wkt()})
+        table.to_csv(path, index=False)
+    return path
+
+
+def write_results(results, buffer, output_dir, result_format="parquet", name=None, lines=None):
+    """
+    Write plot_results and (when the canopy came from the GIS layers) line_results to output_dir;
+    lines are the geometries of the network layer, written with the per-line results.
+    """
+    check_results_format(result_format)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {"plot": write_table(plot_results_table(results, name),
+                                 os.path.join(output_dir, f"plot_results.{result_format}"))}
+    if buffer is not None:
+        # Tables from the streaming line statistics have no geometry
+        paths["lines"] = write_table(line_results_table(buffer, name, geometry=hasattr(buffer, "geometry"),
+                                                        lines=lines),
+                                     os.path.join(output_dir, f"line_results.{result_format}"))
+    return paths
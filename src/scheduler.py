@@ -0,0 +1,113 @@
+"""
+Irrigation of the plot in sectors that fit the pump capacity, with the fewest irrigation hours.
+
+Every line (or every sector already defined in the layer) needs to run long enough for its drippers
+to give the gross demand of the irrigation turn, from the same chain as the main program
+(calculate_net_demand_per_turn with the Canopy Cover of the line, then calculate_gross_demand):
+
+    hours = gross demand per turn (mm) * irrigation width * dripper spacing / dripper flow
+
+and draws drippers * dripper flow (L/h) from the pump while open. Lines are packed into sectors
+whose total flow fits the pump capacity; a sector stays open as long as its longest line, so the
+total irrigation time is the sum of the sector durations. The packing is first-fit on the lines
+sorted by decreasing duration: a line joins the first sector with enough spare flow, which never
+makes that sector longer, and opens a new one only when none has room. Each step is a NumPy search
+over the open sectors, so thousands of lines are scheduled in a few milliseconds.
+"""
+import numpy as np
+import pandas as pd
+
+from current_irrigation_network import calculate_gross_demand, calculate_net_demand_per_turn
+
+
+def calculate_line_hours(nhn_adjusted, fc, irrigation_turn, irrigation_efficiency, irrigation_width,
+                         dripper_spacing, dripper_flow):
+    # Hours every line needs per irrigation turn; fc is the Canopy Cover of every line (mean_value)
+    dn_turn = calculate_net_demand_per_turn(nhn_adjusted, fc, irrigation_turn)
+    gross_demand = calculate_gross_demand(dn_turn, irrigation_efficiency)
+    return gross_demand * irrigation_width * dripper_spacing / dripper_flow
+
+
+def irrigated_hours(hours):
+    # Lines with a non-finite duration (no Canopy Cover measured, or no flow) are left unscheduled like
+    # the lines that need no water
+    hours = np.asarray(hours, dtype=float)
+    return np.where(np.isfinite(hours) & (hours > 0), hours, 0.0)
+
+
+def pack_sectors(hours, flow, pump_capacity):
+    """
+    Sector of every line (-1 for the lines that need no irrigation) with the total flow of every
+    sector at most pump_capacity.
+    """
+    hours = irrigated_hours(hours)
+    flow = np.broadcast_to(np.asarray(flow, dtype=float), hours.shape)
+    if np.any(flow[hours > 0] > pump_capacity):
+        raise ValueError(f"Some lines need more flow ({flow[hours > 0].max():.0f} L/h) than the pump capacity "
+                         f"({pump_capacity:.0f} L/h)")
+
+    sector = np.full(hours.shape, -1, dtype=np.int64)
+    spare = np.empty(np.count_nonzero(hours > 0))
+    n_sectors = 0
+    for line in np.argsort(-hours, kind="stable"):
+        if hours[line] <= 0:
+            break
+        fits = spare[:n_sectors] >= flow[line]
+        k = int(np.argmax(fits)) if n_sectors else 0
+        if not n_sectors or not fits[k]:
+            k = n_sectors
+            spare[k] = pump_capacity
+            n_sectors += 1
+        spare[k] -= flow[line]
+        sector[line] = k
+    return sector
+
+
+def schedule_sectors(hours, flow, pump_capacity, groups=None):
+    """
+    Pack lines (or the groups of lines given by groups, e.g. the valves of the installation) into
+    sectors and return the sector of every line and a table of the sectors in irrigation order.
+    """
+    hours = irrigated_hours(hours)
+    flow = np.broadcast_to(np.asarray(flow, dtype=float), hours.shape)
+    # Lines of a group that need no water add neither flow nor lines to their sector
+    irrigated_flow = np.where(hours > 0, flow, 0.0)
+    if groups is None:
+        sector = pack_sectors(hours, flow, pump_capacity)
+    else:
+        # A group opens and closes at once: it draws the flow of all its lines for as long as its longest line
+        group_ids, group_index = np.unique(np.asarray(groups), return_inverse=True)
+        group_hours = np.zeros(len(group_ids))
+        np.maximum.at(group_hours, group_index, hours)
+        group_flow = np.bincount(group_index, weights=irrigated_flow, minlength=len(group_ids))
+        sector = pack_sectors(group_hours, group_flow, pump_capacity)[group_index]
+
+    scheduled = (sector >= 0) & (hours > 0)
+    n_sectors = sector.max() + 1 if scheduled.any() else 0
+    sector_hours = np.zeros(n_sectors)
+    np.maximum.at(sector_hours, sector[scheduled], hours[scheduled])
+    table = pd.DataFrame({
+        "sector": np.arange(n_sectors),
+        "lines": np.bincount(sector[scheduled], minlength=n_sectors),
+        "flow": np.bincount(sector[scheduled], weights=irrigated_flow[scheduled], minlength=n_sectors),
+        "hours": sector_hours,
+    })
+    table["start"] = table["hours"].cumsum() - table["hours"]
+    table["end"] = table["hours"].cumsum()
+    return sector, table
+
+
+def format_schedule_summary(table, hours, flow, pump_capacity, irrigation_turn):
+    # The lower bound is the time the pump needs running at full capacity to give all the water
+    hours = irrigated_hours(hours)
+    volume = np.sum(hours * np.broadcast_to(flow, hours.shape))
+    total_hours = table["hours"].sum()
+    available_hours = 24 * irrigation_turn
+    text = (
+        f"Sectors: {len(table)} with a pump capacity of {pump_capacity:.0f} L/h ({pump_capacity / 1000:.2f} m3/h)\n"
+        f"Irrigation hours per turn: {total_hours:.2f} h (lower bound with the pump always at full capacity: "
+        f"{volume / pump_capacity:.2f} h)\n"
+    )
+    if total_hours > available_hours:
+        text += f"The sectors do not fit in the irrigation turn of {irrigation_turn} day(s) ({available_hours} h)\n"
+    return text
@@ -0,0 +1,200 @@
+"""
+Uncertainty and sensitivity of the overuse ratio and the label letter (Monte Carlo).
+
+Every input of the calculation chain can be given as a point value or as a distribution:
+
+    {"dist": "normal", "mean": 0.7, "sd": 0.05}
+    {"dist": "uniform", "low": 0.4, "high": 0.6}
+    {"dist": "triangular", "low": 0.8, "mode": 0.9, "high": 0.95}
+    {"dist": "lognormal", "mean": 6.5, "sd": 0.8}      # mean and sd of the variable itself
+
+Samples outside the physical range of an input (PARAMETER_RANGES, e.g. an efficiency in (0, 1]) are
+drawn again, so every distribution is truncated to that range.
+
+All the samples go through pipeline.calculate_fao_results and calculate_irrigation_results as
+arrays in one vectorized pass, and label_letters.assign_letter_indices gives the letter of each sample.
+The result holds percentiles of the overuse ratio, the probability of every letter and the
+first-order Sobol index of every uncertain input (share of the variance of the ratio explained by
+that input alone, estimated by binning the samples on the values of the input).
+"""
+import numpy as np
+
+from pipeline import calculate_fao_results, calculate_irrigation_results
+from label_letters import LABELS, assign_letter_indices
+
+PARAMETERS = ("et0", "kc", "fc", "pe", "au", "eto_percentage", "irrigation_turn", "irrigation_hours",
+              "irrigation_efficiency", "dripper_flow", "dripper_spacing", "irrigation_width")
+DISTRIBUTIONS = {"normal": ("mean", "sd"), "uniform": ("low", "high"), "triangular": ("low", "mode", "high"),
+                 "lognormal": ("mean", "sd")}
+PERCENTILES = (5, 25, 50, 75, 95)
+# Physical range of every input (low, high, low excluded). Samples outside it are drawn again, so the
+# distributions are truncated to the range instead of giving negative efficiencies or Canopy Covers
+PARAMETER_RANGES = {
+    "et0": (0.0, np.inf, False),
+    "kc": (0.0, np.inf, False),
+    "fc": (0.0, 1.0, False),
+    "pe": (0.0, np.inf, False),
+    "au": (0.0, np.inf, False),
+    "eto_percentage": (0.0, np.inf, False),
+    "irrigation_turn": (1.0, np.inf, False),
+    "irrigation_hours": (0.0, 24.0, True),
+    "irrigation_efficiency": (0.0, 1.0, True),
+    "dripper_flow": (0.0, np.inf, True),
+    "dripper_spacing": (0.0, np.inf, True),
+    "irrigation_width": (0.0, np.inf, True),
+}
+MAX_RESAMPLING_ROUNDS = 100
+
+
+def sample_parameter(spec, n_samples, rng):
+    # Point values are kept as scalars, so they broadcast against the sampled inputs
+    if not isinstance(spec, dict):
+        return spec
+    dist = spec.get("dist", "normal")
+    if dist == "normal":
+        return rng.normal(spec["mean"], spec["sd"], n_samples)
+    elif dist == "uniform":
+        return rng.uniform(spec["low"], spec["high"], n_samples)
+    elif dist == "triangular":
+        return rng.triangular(spec["low"], spec["mode"], spec["high"], n_samples)
+    elif dist == "lognormal":
+        # Parameters of the underlying normal from the mean and sd of the variable
+        sigma2 = np.log(1 + (spec["sd"] / spec["mean"]) ** 2)
+        return rng.lognormal(np.log(spec["mean"]) - sigma2 / 2, np.sqrt(sigma2), n_samples)
+    raise ValueError(f"Unknown distribution: {dist} (use one of {', '.join(DISTRIBUTIONS)})")
+
+
+def outside_range(name, values):
+    low, high, low_excluded = PARAMETER_RANGES[name]
+    return ~((values > low if low_excluded else values >= low) & (values <= high))
+
+
+def sample_truncated(name, spec, n_samples, rng):
+    # Draw the samples of one input again while some fall outside its physical range
+    values = sample_parameter(spec, n_samples, rng)
+    if not isinstance(spec, dict):
+        return values
+    bad = outside_range(name, values)
+    for _ in range(MAX_RESAMPLING_ROUNDS):
+        if not bad.any():
+            return values
+        values[bad] = sample_parameter(spec, int(bad.sum()), rng)
+        bad = outside_range(name, values)
+    low, high, _ = PARAMETER_RANGES[name]
+    raise ValueError(f"The distribution of {name} gives almost no values in its valid range ({low} to {high})")
+
+
+def build_specs(point_values, distributions):
+    # Point estimates of a job with the uncertain ones replaced by their distribution. A normal,
+    # lognormal or triangular distribution without mean/mode is centred on the point estimate
+    specs = {name: point_values[name] for name in PARAMETERS}
+    for name, spec in distributions.items():
+        if name not in specs:
+            raise ValueError(f"Unknown parameter for the uncertainty analysis: {name}")
+        spec = dict(spec)
+        dist = spec.get("dist", "normal")
+        if dist not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution for {name}: {dist} (use one of {', '.join(DISTRIBUTIONS)})")
+        if dist == "triangular":
+            spec.setdefault("mode", specs[name])
+        elif dist in ("normal", "lognormal"):
+            spec.setdefault("mean", specs[name])
+        missing = [key for key in DISTRIBUTIONS[dist] if key not in spec]
+        if missing:
+            raise ValueError(f"The {dist} distribution of {name} needs: {', '.join(missing)}")
+        specs[name] = spec
+    return specs
+
+
+def sample_parameters(specs, n_samples, seed=None):
+    rng = np.random.default_rng(seed)
+    missing = [name for name in PARAMETERS if name not in specs]
+    if missing:
+        raise ValueError(f"Missing parameters for the uncertainty analysis: {', '.join(missing)}")
+    return {name: sample_truncated(name, specs[name], n_samples, rng) for name in PARAMETERS}
+
+
+def evaluate_samples(samples):
+    # Run the whole chain from ET0 to the label letter for every sample at once
+    fao_results = calculate_fao_results(samples["et0"], samples["kc"], samples["fc"], samples["pe"], samples["au"],
+                                        samples["eto_percentage"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        irrigation_results = calculate_irrigation_results(
+            fao_results["nhn_adjusted"], samples["fc"], samples["irrigation_turn"], samples["irrigation_hours"],
+            samples["irrigation_efficiency"], samples["dripper_flow"], samples["dripper_spacing"],
+            samples["irrigation_width"])
+    overuse_ratio = irrigation_results["overuse_ratio"]
+    return overuse_ratio, assign_letter_indices(overuse_ratio)
+
+
+def first_order_indices(samples, output, bins=50):
+    # Var(E[Y | X_i]) / Var(Y): the range of X_i is split in equal-width bins and the variance of the
+    # bin means (weighted by their number of samples) is compared with the total variance
+    variance = output.var()
+    mean = output.mean()
+    indices = {}
+    for name, values in samples.items():
+        if np.ndim(values) == 0 or variance == 0:
+            continue
+        low, high = values.min(), values.max()
+        if high == low:
+            continue
+        bin_index = np.minimum(((values - low) * (bins / (high - low))).astype(np.intp), bins - 1)
+        counts = np.bincount(bin_index, minlength=bins)
+        sums = np.bincount(bin_index, weights=output, minlength=bins)
+        filled = counts > 0
+        bin_means = sums[filled] / counts[filled]
+        indices[name] = float(np.sum(counts[filled] * (bin_means - mean) ** 2) / len(output) / variance)
+    return indices
+
+
+def run_uncertainty(specs, n_samples=100000, seed=None, percentiles=PERCENTILES, bins=50):
+    """Sample the inputs, evaluate the chain and summarise the overuse ratio and the letters."""
+    samples = sample_parameters(specs, n_samples, seed)
+    overuse_ratio, letter_indices = evaluate_samples(samples)
+    overuse_ratio = np.broadcast_to(overuse_ratio, (n_samples,))
+    letter_indices = np.broadcast_to(letter_indices, (n_samples,))
+
+    # Samples without an ideal flow (no demand) have no finite ratio; they are left out of the statistics
+    finite = np.isfinite(overuse_ratio)
+    ratios = overuse_ratio[finite]
+    if len(ratios) == 0:
+        return {
+            "n_samples": n_samples,
+            "n_valid": 0,
+            "mean": np.nan,
+            "std": np.nan,
+            "percentiles": dict.fromkeys(percentiles, np.nan),
+            "letter_probabilities": dict.fromkeys(LABELS, 0.0),
+            "sobol_first_order": {},
+        }
+    letter_counts = np.bincount(letter_indices[finite], minlength=len(LABELS))
+    uncertain = {name: np.broadcast_to(values, (n_samples,))[finite] for name, values in samples.items()
+                 if np.ndim(values) > 0}
+
+    return {
+        "n_samples": n_samples,
+        "n_valid": int(finite.sum()),
+        "mean": float(ratios.mean()),
+        "std": float(ratios.std()),
+        "percentiles": dict(zip(percentiles, np.percentile(ratios, percentiles))),
+        "letter_probabilities": dict(zip(LABELS, letter_counts / max(len(ratios), 1))),
+        "sobol_first_order": first_order_indices(uncertain, ratios, bins),
+    }
+
+
+def format_uncertainty_summary(results):
+    if results["n_valid"] == 0:
+        return (f"No valid samples: none of the {results['n_samples']} samples has a finite overuse ratio "
+                f"(no irrigation demand, e.g. Canopy Cover 0)\n")
+    percentiles = ", ".join(f"P{p}: {value:.2f}" for p, value in results["percentiles"].items())
+    letters = ", ".join(f"{label}: {p:.1%}" for label, p in results["letter_probabilities"].items() if p > 0)
+    importances = sorted(results["sobol_first_order"].items(), key=lambda item: item[1], reverse=True)
+    return (
+        f"Samples: {results['n_valid']} of {results['n_samples']} with a finite overuse ratio\n"
+        f"Overuse ratio: mean {results['mean']:.2f}, standard deviation {results['std']:.2f}\n"
+        f"Overuse ratio percentiles: {percentiles}\n"
+        f"Letter probabilities: {letters}\n"
+        f"Parameter importance (first-order Sobol index): "
+        + ", ".join(f"{name}: {value:.2f}" for name, value in importances) + "\n"
+    )
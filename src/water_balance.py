@@ -0,0 +1,195 @@
+"""
+Season-long daily soil water balance of one or many plots (FAO-56, chapter 8).
+
+The root zone depletion Dr of every plot is updated day by day:
+
+    Dr[t] = Dr[t-1] - Peff[t] - I[t] + ETc_adj[t]       limited to 0 <= Dr <= AW
+
+where AW (the [crop] aw of a job) is the total available water of the root zone and RAW = 2/3 AW
+(afu in calc_etc.perform_calculations) is the depletion the crop takes without stress. Above RAW the
+crop transpires less (ETc_adj = Ks * ETc * CC). Water above field capacity is lost as drainage.
+
+Irrigation is only possible on the days of an irrigation turn (every irrigation_turn days). With
+schedule="raw" the plot is irrigated on those days when the depletion exceeds RAW, replacing
+eto_percentage of the depletion; with schedule="fixed" the installation applies the same net depth
+every turn (see calculate_applied_depth).
+
+et0, kc, pe and eto_percentage are daily inputs: a series of shape (days,) shared by every plot or
+an array (days, plots); use shape (1, plots) for a value per plot that is constant over the season.
+fc, au, irrigation_turn, applied_depth and initial_depletion are plot properties: a scalar or (plots,).
+The loop only runs over days; every step is vectorized over the plots.
+"""
+import numpy as np
+
+from calc_etc import perform_calculations
+from calc_etp import calculate_et0_array
+
+SCHEDULES = ("raw", "fixed")
+WEATHER_COLUMNS = ("tmax", "tmin", "tmean", "rs", "rhmean", "u2")
+
+
+def calculate_applied_depth(dripper_flow, irrigation_hours, irrigation_efficiency, dripper_spacing,
+                            irrigation_width):
+    # Net depth (mm = l/m2) that the installation puts in the root zone in one irrigation turn.
+    # Inverse of the chain in pipeline.calculate_irrigation_results, on the same Canopy Cover basis as dn_turn
+    return dripper_flow * irrigation_hours * irrigation_efficiency / (dripper_spacing * irrigation_width)
+
+
+def calculate_season_et0(weather, z, lat):
+    # Daily ET0 of a season of weather (a DataFrame with a 'date' column or a 'day_of_year' column,
+    # plus tmax, tmin, tmean, rs, rhmean and u2, or directly an 'et0' column)
+    if "et0" in weather:
+        return weather["et0"].to_numpy(dtype=float)
+    if "day_of_year" in weather:
+        day_of_year = weather["day_of_year"].to_numpy()
+    else:
+        import pandas as pd
+        day_of_year = pd.to_datetime(weather["date"]).dt.dayofyear.to_numpy()
+    values = [weather[column].to_numpy(dtype=float) for column in WEATHER_COLUMNS]
+    return calculate_et0_array(*values, z, lat, day_of_year)
+
+
+def read_weather(path):
+    """Read a daily weather CSV (one row per day) into a DataFrame."""
+    import pandas as pd
+    return pd.read_csv(path)
+
+
+def simulate_water_balance(et0, kc, fc, au, pe=0.0, eto_percentage=1.0, irrigation_turn=7,
+                           irrigation_efficiency=0.9, schedule="raw", applied_depth=None, initial_depletion=0.0,
+                           keep_daily=True):
+    """
+    Run the daily water balance over days and plots and return the totals per plot (and, with
+    keep_daily, the daily arrays of shape (days, plots)). Depths are in mm.
+    """
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown irrigation schedule: {schedule} (use one of {', '.join(SCHEDULES)})")
+    if schedule == "fixed" and applied_depth is None:
+        raise ValueError("The 'fixed' schedule needs the applied_depth of the installation")
+
+    def daily(values):
+        values = np.asarray(values, dtype=float)
+        return values[:, None] if values.ndim == 1 else values
+
+    et0, kc, pe, eto_percentage = daily(et0), daily(kc), daily(pe), daily(eto_percentage)
+    if et0.ndim != 2:
+        raise ValueError("et0 must be a daily series (days,) or an array (days, plots)")
+    n_days = et0.shape[0]
+    plot_shape = np.broadcast_shapes(np.shape(fc), np.shape(au), np.shape(irrigation_turn),
+                                     np.shape(initial_depletion), np.shape(0.0 if applied_depth is None else applied_depth))
+    shape = np.broadcast_shapes(et0.shape, kc.shape, pe.shape, eto_percentage.shape, (1,) + (plot_shape or (1,)))
+    if shape[0] != n_days:
+        raise ValueError("The daily inputs must all cover the same number of days")
+
+    def per_plot(values):
+        return np.broadcast_to(np.asarray(values, dtype=float), shape[1:])
+
+    fc = per_plot(fc)
+    if np.any(per_plot(au) <= 0):
+        raise ValueError("The available water (AW) must be greater than 0 to run the water balance")
+
+    # Calculate ETc, RAW and the NIWR of every day and plot at once
+    etc, afu, nhn, nhn_adjusted = perform_calculations(et0, kc, pe, per_plot(au), eto_percentage)
+    etc, nhn_adjusted = np.broadcast_to(etc, shape), np.broadcast_to(nhn_adjusted, shape)
+    pe, eto_percentage = np.broadcast_to(pe, shape), np.broadcast_to(eto_percentage, shape)
+    taw = per_plot(au)
+    raw = afu
+    crop_etc = etc * fc  # Localized irrigation: only the canopy area transpires
+
+    # Days of the season with an irrigation turn (the last day of every turn)
+    irrigation_turn = np.broadcast_to(np.asarray(irrigation_turn, dtype=int), shape[1:])
+    is_turn_day = np.arange(n_days)[:, None] % irrigation_turn == irrigation_turn - 1
+    if schedule == "fixed":
+        applied_depth = per_plot(applied_depth)
+
+    depletion = np.broadcast_to(np.asarray(initial_depletion, dtype=float), shape[1:]).copy()
+    if keep_daily:
+        daily_depletion = np.empty(shape)
+        daily_irrigation = np.empty(shape)
+        daily_eta = np.empty(shape)
+        daily_ks = np.empty(shape)
+        daily_drainage = np.empty(shape)
+
+    applied_net = np.zeros(shape[1:])
+    eta_total = np.zeros(shape[1:])
+    drainage_total = np.zeros(shape[1:])
+    stress_days = np.zeros(shape[1:], dtype=int)
+    irrigation_events = np.zeros(shape[1:], dtype=int)
+
+    for day in range(n_days):
+        # Water stress coefficient from the depletion at the start of the day (FAO-56 eq. 84)
+        ks = np.clip((taw - depletion) / (taw - raw), 0.0, 1.0)
+        eta = ks * crop_etc[day]
+
+        # Irrigation on turn days: refill eto_percentage of the depletion reached when it exceeds RAW,
+        # or apply the fixed depth of the installation
+        if schedule == "raw":
+            expected = depletion + eta - pe[day]
+            irrigation = np.where(is_turn_day[day] & (expected > raw), eto_percentage[day] * expected, 0.0)
+            irrigation = np.maximum(irrigation, 0.0)
+        else:
+            irrigation = np.where(is_turn_day[day], applied_depth, 0.0)
+
+        depletion = depletion - pe[day] - irrigation + eta
+        drainage = np.maximum(-depletion, 0.0)  # Water above field capacity percolates
+        depletion = np.clip(depletion, 0.0, taw)
+
+        applied_net += irrigation
+        eta_total += eta
+        drainage_total += drainage
+        stress_days += depletion > raw
+        irrigation_events += irrigation > 0
+
+        if keep_daily:
+            daily_depletion[day] = depletion
+            daily_irrigation[day] = irrigation
+            daily_eta[day] = eta
+            daily_ks[day] = ks
+            daily_drainage[day] = drainage
+
+    # Water the FAO-56 chain of the tool asks for over the same days (NIWR adjusted on the Canopy Cover basis)
+    needed_net = np.maximum(nhn_adjusted * fc, 0.0).sum(axis=0)
+    applied_gross = applied_net / irrigation_efficiency
+    needed_gross = needed_net / irrigation_efficiency
+
+    results = {
+        "days": n_days,
+        "applied_net": applied_net,
+        "applied_gross": applied_gross,
+        "needed_net": needed_net,
+        "needed_gross": needed_gross,
+        "applied_needed_ratio": np.divide(applied_gross, needed_gross, out=np.full(shape[1:], np.nan),
+                                          where=needed_gross > 0),
+        "etc": crop_etc.sum(axis=0),
+        "eta": eta_total,
+        "drainage": drainage_total,
+        "stress_days": stress_days,
+        "irrigation_events": irrigation_events,
+        "final_depletion": depletion,
+        "raw": raw,
+        "taw": taw,
+    }
+    if keep_daily:
+        results.update({
+            "daily_depletion": daily_depletion,
+            "daily_irrigation": daily_irrigation,
+            "daily_eta": daily_eta,
+            "daily_ks": daily_ks,
+            "daily_drainage": daily_drainage,
+            "daily_cumulative_applied": np.cumsum(daily_irrigation, axis=0) / irrigation_efficiency,
+            "daily_cumulative_needed": np.cumsum(np.maximum(nhn_adjusted * fc, 0.0), axis=0) / irrigation_efficiency,
+        })
+    return results
+
+
+def format_water_balance_summary(results, plot=0):
+    return (
+        f"Season length: {results['days']} day(s)\n"
+        f"Crop evapotranspiration (ETc x CC): {results['etc'][plot]:.1f} mm\n"
+        f"Actual crop evapotranspiration: {results['eta'][plot]:.1f} mm\n"
+        f"Irrigation applied (gross): {results['applied_gross'][plot]:.1f} mm in {results['irrigation_events'][plot]} turn(s)\n"
+        f"Irrigation needed (gross NIWR adjusted): {results['needed_gross'][plot]:.1f} mm\n"
+        f"Applied / needed: {results['applied_needed_ratio'][plot]:.2f}\n"
+        f"Days with depletion above RAW: {results['stress_days'][plot]}\n"
+        f"Drainage below the root zone: {results['drainage'][plot]:.1f} mm\n"
+    )
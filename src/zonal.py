@@ -0,0 +1,184 @@
+import numpy as np
+import rasterio
+import rasterio.features
+import rasterio.windows
+import shapely
+from rasterio.enums import MergeAlg
+from shapely import STRtree
+
+# How pixels covered by the buffers of several lines are counted, see calculate_zonal_statistics
+OVERLAP_MODES = ('shared', 'first', 'split')
+
+
+def assign_non_overlapping_layers(geometries):
+    """Split the geometries into layers whose members never overlap each other."""
+    geometries = np.asarray(geometries, dtype=object)
+    layers = np.zeros(len(geometries), dtype=np.int32)
+    if len(geometries) == 0:
+        return layers
+
+    # Candidate pairs from the spatial index; only pairs sharing area need different layers
+    tree = STRtree(geometries)
+    left, right = tree.query(geometries, predicate='intersects')
+    keep = left < right
+    left, right = left[keep], right[keep]
+    shares_area = shapely.area(shapely.intersection(geometries[left], geometries[right])) > 0
+    left, right = left[shares_area], right[shares_area]
+    if len(left) == 0:
+        return layers
+
+    # Greedy colouring in line order: each geometry takes the first layer not used by an earlier neighbour
+    neighbours = {}
+    for i, j in zip(left.tolist(), right.tolist()):
+        neighbours.setdefault(j, []).append(i)
+    for j in sorted(neighbours):
+        used = {layers[i] for i in neighbours[j]}
+        layer = 0
+        while layer in used:
+            layer += 1
+        layers[j] = layer
+    return layers
+
+
+def accumulate_zone_sums(labels, values, sums, weights=None):
+    """Add the valid pixels (value >= 0) of one label image to the running count/sum/sum of squares."""
+    valid = (labels > 0) & (values >= 0)  # Ignore values outside the mask
+    zone = labels[valid]
+    pixel_values = values[valid].astype(np.float64)
+    pixel_weights = np.ones(len(zone)) if weights is None else weights[valid]
+    size = len(sums['count'])
+    sums['count'] += np.bincount(zone, weights=pixel_weights, minlength=size)
+    sums['sum'] += np.bincount(zone, weights=pixel_weights * pixel_values, minlength=size)
+    sums['sum_sq'] += np.bincount(zone, weights=pixel_weights * pixel_values * pixel_values, minlength=size)
+
+
+def empty_zone_sums(n_zones):
+    # Index 0 collects the background so that labels can be used directly as bincount indices
+    return {key: np.zeros(n_zones + 1, dtype=np.float64) for key in ('count', 'sum', 'sum_sq')}
+
+
+def finalize_zone_sums(sums, overlap='shared'):
+    count = sums['count'][1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(count > 0, sums['sum'][1:] / count, np.nan)
+        variance = np.where(count > 0, sums['sum_sq'][1:] / count - mean * mean, np.nan)
+    std = np.sqrt(np.clip(variance, 0, None))
+    if overlap != 'split':  # With 'split' the count is the effective (weighted) number of pixels
+        count = count.astype(np.int64)
+    return {'mean': mean, 'count': count, 'std': std}
+
+
+def check_overlap_mode(overlap):
+    if overlap not in OVERLAP_MODES:
+        raise ValueError(f"Unknown overlap mode '{overlap}', use one of: {', '.join(OVERLAP_MODES)}")
+
+
+def window_zone_pixels(geometries, idx, layers, out_shape, transform, overlap='shared'):
+    """
+    Pixels of the geometries idx over one raster window: flat pixel index in the window, zone label
+    (geometry index + 1) and weight of every pixel of every zone (weights is None unless overlap='split').
+    """
+    if overlap == 'first':
+        # A single label image; geometries are burnt in reverse order so the first listed line wins
+        idx = idx[::-1]
+        images = [rasterio.features.rasterize(zip(geometries[idx], (idx + 1).tolist()), out_shape=out_shape,
+                                              transform=transform, fill=0, dtype='int32')]
+    else:
+        images = (rasterio.features.rasterize(zip(geometries[layer_idx], (layer_idx + 1).tolist()),
+                                              out_shape=out_shape, transform=transform, fill=0, dtype='int32')
+                  for layer_idx in (idx[layers[idx] == layer] for layer in np.unique(layers[idx])))
+
+    coverage_weights = None
+    if overlap == 'split':
+        # Number of buffers covering each pixel; a shared pixel counts 1/k for each of its k lines
+        coverage = rasterio.features.rasterize(((geometry, 1) for geometry in geometries[idx]), out_shape=out_shape,
+                                               transform=transform, fill=0, merge_alg=MergeAlg.add, dtype='int32')
+        coverage_weights = (1.0 / np.maximum(coverage, 1)).ravel()
+
+    pixels, labels = [], []
+    for image in images:
+        image = image.ravel()
+        flat = np.flatnonzero(image)
+        pixels.append(flat)
+        labels.append(image[flat])
+    pixels = np.concatenate(pixels) if pixels else np.empty(0, dtype=np.int64)
+    labels = np.concatenate(labels) if labels else np.empty(0, dtype=np.int32)
+    weights = coverage_weights[pixels] if coverage_weights is not None else None
+    return pixels, labels, weights
+
+
+def accumulate_window(geometries, idx, layers, values, transform, sums, overlap='shared'):
+    """Rasterize the geometries idx over one raster window and add their pixels to the zone sums."""
+    pixels, labels, weights = window_zone_pixels(geometries, idx, layers, values.shape, transform, overlap)
+    accumulate_zone_sums(labels, values.ravel()[pixels], sums, weights)
+
+
+def calculate_zonal_statistics(geometries, dem, transform, overlap='shared'):
+    """
+    Mean, pixel count and standard deviation of the raster inside every geometry.
+
+    All geometries are rasterized once into label images (one per group of non-overlapping
+    geometries) and the statistics of every zone are computed with a single bincount pass
+    per label image, instead of masking the whole raster once per geometry.
+
+    overlap sets how pixels covered by several buffers (neighbouring rows) are counted:
+    'shared' counts them in every line (same as masking each buffer on its own), 'first'
+    gives them only to the first line that covers them, and 'split' weights them 1/k in
+    each of the k lines.
+    """
+    check_overlap_mode(overlap)
+    geometries = np.asarray(geometries, dtype=object)
+    layers = assign_non_overlapping_layers(geometries) if overlap != 'first' else None
+    sums = empty_zone_sums(len(geometries))
+    accumulate_window(geometries, np.arange(len(geometries)), layers, dem, transform, sums, overlap)
+    return finalize_zone_sums(sums, overlap)
+
+
+def iter_tile_windows(src, tile_size):
+    """Yield windows of about tile_size x tile_size pixels aligned to the raster's internal blocks."""
+    block_rows, block_cols = src.block_shapes[0]
+    tile_rows = max(block_rows, tile_size // block_rows * block_rows)
+    tile_cols = max(block_cols, tile_size // block_cols * block_cols)
+    for row_off in range(0, src.height, tile_rows):
+        for col_off in range(0, src.width, tile_cols):
+            yield rasterio.windows.Window(col_off, row_off, min(tile_cols, src.width - col_off),
+                                          min(tile_rows, src.height - row_off))
+
+
+def match_tiles_to_geometries(geometries, windows, raster_transform):
+    """
+    Geometries reaching each tile, from an STRtree built over the geometries.
+
+    Returns {tile position: array of geometry indices}; tiles that no geometry reaches are left out.
+    """
+    tile_boxes = shapely.box(*np.array([rasterio.windows.bounds(window, raster_transform) for window in windows]).T)
+    tree = STRtree(geometries)
+    tile_idx, geometry_idx = tree.query(tile_boxes, predicate='intersects')
+    order = np.lexsort((geometry_idx, tile_idx))
+    tile_idx, geometry_idx = tile_idx[order], geometry_idx[order]
+    tiles, starts = np.unique(tile_idx, return_index=True)
+    return dict(zip(tiles.tolist(), np.split(geometry_idx, starts[1:])))
+
+
+def calculate_zonal_statistics_from_file(geometries, tif_path, tile_size=2048, overlap='shared'):
+    """
+    Same statistics as calculate_zonal_statistics, reading the raster tile by tile.
+
+    An STRtree over the geometries gives, for every tile, the geometries that reach it: only
+    those tiles are read and each one is rasterized only with its own geometries, so the work
+    grows with the size of the network and peak memory is bounded by the tile size instead
+    of the size of the mosaic.
+    """
+    check_overlap_mode(overlap)
+    geometries = np.asarray(geometries, dtype=object)
+    layers = assign_non_overlapping_layers(geometries) if overlap != 'first' else None
+    sums = empty_zone_sums(len(geometries))
+
+    with rasterio.open(tif_path) as src:
+        windows = list(iter_tile_windows(src, tile_size))
+        for tile, idx in match_tiles_to_geometries(geometries, windows, src.transform).items():
+            window = windows[tile]
+            values = src.read(1, window=window)
+            accumulate_window(geometries, idx, layers, values, src.window_transform(window), sums, overlap)
+
+    return finalize_zone_sums(sums, overlap)
@@ -0,0 +1,20 @@
+import pytest
+
+import batch
+
+
+def write_manifest(tmp_path, name):
+    path = tmp_path / "manifest.json"
+    path.write_text('{"plots": [{"name": %s, "canopy": {"cc": 0.5}}]}' % name.replace("\\", "\\\\").join('""'))
+    return str(path)
+
+
+@pytest.mark.parametrize("name", ["../outside", "..", "a/b", "a\\b", "/tmp/plot"])
+def test_manifest_rejects_names_outside_the_output_dir(tmp_path, name):
+    with pytest.raises(ValueError, match="Invalid plot name"):
+        batch.load_manifest(write_manifest(tmp_path, name))
+
+
+def test_manifest_accepts_plain_names(tmp_path):
+    jobs = batch.load_manifest(write_manifest(tmp_path, "block-01.v2"))
+    assert jobs[0]["name"] == "block-01.v2"
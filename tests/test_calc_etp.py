@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from calc_etp import calculate_et0, calculate_et0_array
+
+
+def random_weather(n, seed=0):
+    rng = np.random.default_rng(seed)
+    tmin = rng.uniform(-5, 20, n)
+    tmax = tmin + rng.uniform(2, 20, n)
+    return pd.DataFrame({
+        "tmax": tmax, "tmin": tmin, "tmean": (tmax + tmin) / 2, "rs": rng.uniform(1, 32, n),
+        "rhmean": rng.uniform(15, 100, n), "u2": rng.uniform(0.2, 8, n), "z": rng.uniform(0, 2500, n),
+        "lat": rng.uniform(-60, 60, n), "day_of_year": rng.integers(1, 367, n),
+    })
+
+
+def test_array_matches_scalar_on_pandas_columns():
+    weather = random_weather(500)
+    expected = [calculate_et0(*row) for row in weather.itertuples(index=False)]
+    result = calculate_et0_array(*(weather[column] for column in weather.columns))
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+def test_array_broadcasts_scalars_and_arrays():
+    # One station (scalar altitude and latitude) over a season, and a grid of stations on one day
+    weather = random_weather(60, seed=1)
+    z, lat = 600.0, 42.3
+    result = calculate_et0_array(weather["tmax"].to_numpy(), weather["tmin"].to_numpy(), weather["tmean"].to_numpy(),
+                                 weather["rs"].to_numpy(), weather["rhmean"].to_numpy(), weather["u2"].to_numpy(), z,
+                                 lat, np.arange(1, 61))
+    expected = [calculate_et0(row.tmax, row.tmin, row.tmean, row.rs, row.rhmean, row.u2, z, lat, day)
+                for day, row in enumerate(weather.itertuples(index=False), start=1)]
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+    lats = np.linspace(-50, 50, 7)[:, None]
+    days = np.array([1, 100, 200, 365])[None, :]
+    grid = calculate_et0_array(30, 15, 22.5, 25, 50, 2, 300, lats, days)
+    assert grid.shape == (7, 4)
+    expected = [[calculate_et0(30, 15, 22.5, 25, 50, 2, 300, lat, day) for day in days[0]] for lat in lats[:, 0]]
+    np.testing.assert_allclose(grid, expected, rtol=1e-12)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+from shapely import linestrings
+
+import canopy_series
+from zonal import calculate_zonal_statistics_from_file
+
+
+def write_raster(path, values):
+    with rasterio.open(path, "w", driver="GTiff", width=values.shape[1], height=values.shape[0], count=1,
+                       dtype="float32", transform=from_origin(0, 20, 0.1, 0.1)) as dst:
+        dst.write(values, 1)
+    return str(path)
+
+
+@pytest.mark.parametrize("overlap", ["shared", "split"])
+def test_nan_nodata_matches_zonal_statistics(tmp_path, overlap):
+    # Two dates with NaN nodata holes; every date must give the same statistics as the single-raster zonal pass
+    rng = np.random.default_rng(3)
+    paths = []
+    for date in range(2):
+        values = rng.random((200, 200), dtype=np.float32)
+        values[rng.random(values.shape) < 0.2] = np.nan
+        paths.append(write_raster(tmp_path / f"date{date}.tif", values))
+    buffers = linestrings([[(1, y), (19, y)] for y in np.arange(1, 19, 0.6)]).tolist()
+    buffers = np.array([line.buffer(0.4, cap_style="flat") for line in buffers], dtype=object)
+
+    index = canopy_series.build_zone_index(buffers, paths[0], tile_size=64, overlap=overlap)
+    stats = canopy_series.calculate_stack_statistics(index, paths, len(buffers), overlap)
+    for date, path in enumerate(paths):
+        expected = calculate_zonal_statistics_from_file(buffers, path, tile_size=64, overlap=overlap)
+        np.testing.assert_allclose(stats["mean"][:, date], expected["mean"])
+        np.testing.assert_allclose(stats["std"][:, date], expected["std"], atol=1e-9)
+        assert np.isfinite(stats["std"]).all()
+
+
+def test_unwritable_cache_uses_the_index_in_memory(tmp_path):
+    values = np.random.default_rng(0).random((200, 200), dtype=np.float32)
+    paths = [write_raster(tmp_path / "date0.tif", values)]
+    vector_path = tmp_path / "network.gpkg"
+    vector_path.write_text("")  # Only its signature is used for the cache key
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")  # A file where the cache folder should be
+    geometries = np.array([line.buffer(0.4, cap_style="flat")
+                           for line in linestrings([[(1, y), (19, y)] for y in (5.0, 10.0)])], dtype=object)
+
+    index = canopy_series.get_zone_index(str(vector_path), geometries, paths, 0.4, tile_size=64,
+                                         cache_dir=str(blocked / "cache"))
+    stats = canopy_series.calculate_stack_statistics(index, paths, len(geometries))
+    expected = calculate_zonal_statistics_from_file(geometries, paths[0], tile_size=64)
+    np.testing.assert_allclose(stats["mean"][:, 0], expected["mean"])
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from dataset_cache import DatasetCache
+
+
+def load_array(path, size=1000):
+    with open(path) as file:
+        return np.full(size, float(file.read()))
+
+
+def test_bounded_by_bytes(tmp_path):
+    cache = DatasetCache(max_bytes=20000)
+    paths = []
+    for k in range(3):
+        paths.append(str(tmp_path / f"{k}.txt"))
+        with open(paths[-1], "w") as file:
+            file.write(str(k))
+        cache.get(load_array, paths[-1])  # 8000 bytes each
+    # The oldest array is evicted to stay under 20000 bytes
+    assert len(cache) == 2 and cache.nbytes == 16000
+    cache.get(load_array, paths[1])
+    assert cache.hits == 1
+    # Values larger than the whole cache are not kept
+    cache.get(load_array, paths[0], 5000)
+    assert len(cache) == 2 and cache.nbytes <= 20000
+
+
+def test_new_version_of_a_file_drops_the_old_one(tmp_path):
+    cache = DatasetCache()
+    path = str(tmp_path / "value.txt")
+    with open(path, "w") as file:
+        file.write("1")
+    assert cache.get(load_array, path)[0] == 1
+    with open(path, "w") as file:
+        file.write("22")
+    os.utime(path, ns=(0, 1))
+    assert cache.get(load_array, path)[0] == 22
+    assert len(cache) == 1 and cache.nbytes == 8000
@@ -0,0 +1,54 @@
+import pytest
+
+import headless
+
+JOB = """
+[et0]
+value = 6.5
+
+[crop]
+kc = 0.7
+eto_percentage = 0.3
+
+[canopy]
+cc = 0.5
+
+[dripper]
+flow = 2.0
+spacing = 0.75
+irrigation_width = 1.5
+
+[irrigation]
+turn = 7
+hours = 8
+efficiency = 0.9
+
+[output]
+maps = false
+"""
+
+
+def run_main(tmp_path, extra=""):
+    job_path = tmp_path / "job.toml"
+    job_path.write_text(JOB + extra)
+    return headless.main([str(job_path), "--output-dir", str(tmp_path / "results")])
+
+
+def test_job_runs(tmp_path):
+    assert run_main(tmp_path) == 0
+    assert (tmp_path / "results" / "summary.txt").exists()
+
+
+@pytest.mark.parametrize("extra, message", [
+    ("\n[sizng]\ncatalog = [2.0]\n", "Unknown section [sizng]"),
+    ("\n[uncertainty]\nkc = { dist = 'normal', sd = 0.05 }\nbogus = 1\n", "[uncertainty]"),
+    ("\n[optimize]\ntarget = 'A'\n", "[optimize]"),
+])
+def test_unknown_sections_and_keys_are_reported(tmp_path, capsys, extra, message):
+    assert run_main(tmp_path, extra) == 1
+    assert message in capsys.readouterr().err
+
+
+def test_wrong_value_types_are_reported_without_traceback(tmp_path, capsys):
+    assert run_main(tmp_path, "\n[uncertainty]\nsamples = 100\nkc = { dist = 'normal', sd = 'wide' }\n") == 1
+    assert capsys.readouterr().err.startswith("Error:")
@@ -0,0 +1,63 @@
+import numpy as np
+
+import hydraulics
+
+
+def reference_lateral(n_drippers, dripper_flow, spacing, inlet_pressure, nominal_pressure, exponent, diameter,
+                      roughness, slope):
+    # One lateral at a time: march from the end pressure to the inlet in plain Python and bisect the end pressure
+    k = dripper_flow / nominal_pressure ** exponent
+    rise = slope * spacing
+
+    def march(end_pressure):
+        pressure = end_pressure
+        flows = []
+        pipe_flow = 0.0
+        for j in range(n_drippers):
+            if j:
+                pressure += hydraulics.hazen_williams_loss(pipe_flow, spacing, diameter, roughness) + rise
+            flows.append(k * pressure ** exponent if pressure > 0 else 0.0)
+            pipe_flow += flows[-1]
+        inlet = pressure + hydraulics.hazen_williams_loss(pipe_flow, spacing, diameter, roughness) + rise
+        return inlet, flows
+
+    low, high = -abs(slope) * n_drippers * spacing - 1.0, inlet_pressure + abs(slope) * n_drippers * spacing + 1.0
+    for _ in range(80):
+        middle = (low + high) / 2
+        if march(middle)[0] < inlet_pressure:
+            low = middle
+        else:
+            high = middle
+    _, flows = march((low + high) / 2)
+    return np.mean(flows), min(flows), max(flows), max((low + high) / 2, 0.0)
+
+
+def test_matches_the_reference_march():
+    rng = np.random.default_rng(2)
+    lengths = rng.uniform(5, 150, 40)
+    for slope in (-0.01, 0.0, 0.02):
+        results = hydraulics.simulate_laterals(lengths, 2.0, 0.5, inlet_pressure=12.0, nominal_pressure=10.0,
+                                               exponent=0.5, diameter=0.0136, slope=slope, tolerance=1e-9)
+        assert results["converged"].all()
+        counts = hydraulics.count_drippers(lengths, 0.5)
+        expected = np.array([reference_lateral(n, 2.0, 0.5, 12.0, 10.0, 0.5, 0.0136, 140.0, slope) for n in counts])
+        np.testing.assert_allclose(results["mean_flow"], expected[:, 0], rtol=1e-8)
+        np.testing.assert_allclose(results["min_flow"], expected[:, 1], rtol=1e-8)
+        np.testing.assert_allclose(results["max_flow"], expected[:, 2], rtol=1e-8)
+        np.testing.assert_allclose(results["end_pressure"], expected[:, 3], atol=1e-7)
+
+
+def test_nominal_flow_without_friction():
+    results = hydraulics.simulate_laterals(np.array([10.0, 50.0, 100.0]), 1.6, 0.75, inlet_pressure=10.0,
+                                           nominal_pressure=10.0, diameter=1.0)
+    np.testing.assert_allclose(results["mean_flow"], 1.6, rtol=1e-6)
+    np.testing.assert_allclose(results["emission_uniformity"], 1.0, rtol=1e-6)
+
+
+def test_long_uphill_lateral_runs_dry():
+    # 200 m at 10 % rise 20 m, more than the 10 m at the inlet: the end of the lateral gets no water
+    results = hydraulics.simulate_laterals(np.array([200.0]), 2.0, 0.5, inlet_pressure=10.0, slope=0.1)
+    assert results["converged"].all()
+    assert results["end_pressure"][0] == 0.0
+    assert results["min_flow"][0] == 0.0
+    assert 0 < results["mean_flow"][0] < 2.0
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import label_letters
+import ratio_label
+
+
+def test_letters_at_the_range_limits():
+    ratios = np.array([0, 4.9, 5, 14.9, 15, 30, 50, 80, 149.9, 150.1, 1000])
+    assert label_letters.assign_letters(ratios).tolist() == ["A+++", "A+++", "A+++", "A+++", "A++", "A+", "A", "B",
+                                                             "B", "D", "D"]
+    assert ratio_label.assign_letter(100) == label_letters.assign_letter(100) == "B"
+
+
+def test_numeric_modules_do_not_import_matplotlib():
+    code = "import sys, optimizer, uncertainty; print('matplotlib' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(label_letters.__file__))
+    assert result.stdout.strip() == "False"
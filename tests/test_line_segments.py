@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import rasterio
+import shapely
+from rasterio.transform import from_origin
+from shapely import LineString, MultiLineString
+from shapely.ops import substring
+
+import line_segments
+from zonal import calculate_zonal_statistics_from_file
+
+SEGMENT_LENGTH = 5.0
+
+
+@pytest.fixture
+def lines():
+    return np.array([
+        LineString([(1, 1), (31, 1)]),                               # 30 m: an exact multiple of the segment length
+        LineString([(1, 4), (12, 4), (12, 12), (27.5, 16)]),         # Bends inside and on the segment cuts
+        MultiLineString([[(1, 20), (14, 20)], [(17, 20), (29, 24)]]),  # Segments never jump the gap between parts
+        LineString([(2, 27), (4, 27)]),                              # Shorter than one segment
+    ], dtype=object)
+
+
+def test_segment_lengths_add_up_to_the_lines(lines):
+    table = line_segments.build_line_table(lines, SEGMENT_LENGTH)
+    segments = line_segments.split_lines(table)
+    lengths = shapely.length(segments["geometry"])
+    np.testing.assert_allclose(np.bincount(segments["line"], weights=lengths), shapely.length(lines))
+    assert lengths.max() <= SEGMENT_LENGTH + 1e-9
+    assert lengths.min() > 1e-9  # No empty last segment on the exact multiple
+    assert np.bincount(segments["line"]).tolist() == [6, 8, 3 + 3, 1]
+
+
+def test_segments_match_substring(lines):
+    table = line_segments.build_line_table(lines, SEGMENT_LENGTH)
+    segments = line_segments.split_lines(table)
+    expected = []
+    for part in shapely.get_parts(lines):
+        starts = np.arange(line_segments.count_segments([part.length], SEGMENT_LENGTH)[0]) * SEGMENT_LENGTH
+        expected += [substring(part, start, min(start + SEGMENT_LENGTH, part.length)) for start in starts]
+    assert len(expected) == len(segments["geometry"])
+    for geometry, reference in zip(segments["geometry"], expected):
+        assert geometry.equals_exact(reference, 1e-9)
+
+
+def test_segment_counts_add_up_to_the_line_counts(tmp_path, lines):
+    path = str(tmp_path / "canopy.tif")
+    values = np.random.default_rng(4).random((300, 320), dtype=np.float32)
+    with rasterio.open(path, "w", driver="GTiff", width=320, height=300, count=1, dtype="float32",
+                       transform=from_origin(0, 30, 0.1, 0.1)) as dst:
+        dst.write(values, 1)
+    buffers = np.array([line.buffer(1.0, cap_style="flat") for line in lines], dtype=object)
+    table = line_segments.build_line_table(lines, SEGMENT_LENGTH)
+    segments = line_segments.split_lines(table)
+
+    stats = line_segments.calculate_segment_statistics(buffers, table, path, tile_size=128)
+    expected = calculate_zonal_statistics_from_file(buffers, path, tile_size=128)
+    np.testing.assert_array_equal(np.bincount(segments["line"], weights=stats["count"]), expected["count"])
+    line_means = np.bincount(segments["line"], weights=stats["count"] * stats["mean"]) / expected["count"]
+    np.testing.assert_allclose(line_means, expected["mean"])
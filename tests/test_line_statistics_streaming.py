@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+import gis
+
+NETWORK = os.path.join(os.path.dirname(__file__), os.pardir, "src", "GISdataExample", "irrigation_network.shp")
+
+
+@pytest.fixture
+def canopy_tif(tmp_path):
+    # Random canopy mask covering the example network
+    bounds = gis.read_vector_layer(NETWORK).total_bounds
+    transform = from_origin(bounds[0] - 5, bounds[3] + 5, 0.1, 0.1)
+    shape = (int((bounds[3] - bounds[1] + 10) / 0.1), int((bounds[2] - bounds[0] + 10) / 0.1))
+    values = np.random.default_rng(0).random(shape, dtype=np.float32).round()
+    path = str(tmp_path / "canopy.tif")
+    with rasterio.open(path, "w", driver="GTiff", width=shape[1], height=shape[0], count=1, dtype="float32",
+                       transform=transform) as dst:
+        dst.write(values, 1)
+    return path
+
+
+@pytest.mark.parametrize("overlap, chunk_size", [("shared", 7), ("first", 7), ("split", 7), ("split", 1000)])
+def test_streaming_matches_in_memory_metrics(canopy_tif, overlap, chunk_size):
+    fc, buffer, _ = gis.calculate_coverage_factor(canopy_tif, NETWORK, 2.5, show=False, plot=False,
+                                                  overlap=overlap)
+    gis.add_line_metrics(buffer, 3.5, fc, 2.0)
+    columns = ["length", "mean_value", "ideal_liters", "rounded_ideal_liters", "overuse_ratio"]
+
+    chunked = gis.calculate_line_statistics_streaming(NETWORK, canopy_tif, 2.5, chunk_size=chunk_size, overlap=overlap,
+                                                      liters_per_dripper=3.5, avg_fc=fc, actual_flow=2.0)
+    at_end = gis.calculate_line_statistics_streaming(NETWORK, canopy_tif, 2.5, chunk_size=chunk_size, overlap=overlap,
+                                                     liters_per_dripper=3.5, actual_flow=2.0)
+    np.testing.assert_allclose(chunked[columns].to_numpy(), buffer[columns].to_numpy())
+    np.testing.assert_allclose(at_end[columns].to_numpy(), buffer[columns].to_numpy())
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from shapely import linestrings
+
+import network_topology
+
+
+def comb_layout():
+    # 10 laterals on one submain fed by a main; lateral 0 starts at the joint of the main and the
+    # submain and is listed first, so it is the lowest-index line of the part
+    laterals = [[(0, 10 * k), (30, 10 * k)] for k in range(10)]
+    submain = [(0, 0), (0, 90)]
+    main = [(-50, 0), (0, 0)]
+    return linestrings(np.array(laterals + [submain, main], dtype=float))
+
+
+def test_comb_roles_and_pump_flow():
+    topology = network_topology.build_network_topology(comb_layout(), pump=(-50, 0))
+    role = topology["role"]
+    assert role[11] == "main"
+    assert role[10] == "submain"
+    assert (role[:10] == "lateral").all()
+    assert topology["parent"][0] == 10
+
+    demand = network_topology.calculate_lateral_demand(role, np.full(12, 100), 2.0)
+    flow = network_topology.accumulate_upstream(topology["parent"], topology["depth"], demand)
+    assert flow[11] == pytest.approx(10 * 200)
+    assert flow[10] == pytest.approx(10 * 200)
+    assert (demand[10:] == 0).all()
+
+
+def test_connected_lines_need_the_pump():
+    with pytest.raises(ValueError, match="pump"):
+        network_topology.build_network_topology(comb_layout())
+
+
+def test_separate_lines_without_pump():
+    lines = linestrings(np.array([[(0, 5 * k), (30, 5 * k)] for k in range(4)], dtype=float))
+    topology = network_topology.build_network_topology(lines)
+    assert (topology["role"] == "lateral").all()
+    assert (topology["parent"] == -1).all()
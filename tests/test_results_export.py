@@ -0,0 +1,29 @@
+import geopandas as gpd
+import pytest
+from shapely import LineString
+
+import results_export
+
+
+@pytest.fixture
+def network():
+    lines = gpd.GeoSeries([LineString([(0, 0), (10, 0)]), LineString([(0, 2), (10, 2)])], index=[4, 7],
+                          crs="EPSG:25830")
+    buffer = gpd.GeoDataFrame({"length": lines.length, "mean_value": [0.4, 0.6]},
+                              geometry=lines.buffer(0.75, cap_style="flat"), crs=lines.crs)
+    return lines, buffer
+
+
+def test_line_results_keep_the_line_geometry(network, tmp_path):
+    lines, buffer = network
+    table = results_export.line_results_table(buffer, "plot", lines=lines)
+    assert table["line_id"].tolist() == [4, 7]
+    assert (table.geom_type == "LineString").all()
+    assert table.crs == lines.crs
+    path = results_export.write_table(table, str(tmp_path / "line_results.csv"))
+    assert "LINESTRING" in open(path).read()
+
+
+def test_line_results_without_lines_keep_the_buffers(network):
+    _, buffer = network
+    assert (results_export.line_results_table(buffer).geom_type == "Polygon").all()
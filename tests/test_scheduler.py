@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+import scheduler
+
+
+def test_groups_only_count_the_flow_of_irrigated_lines():
+    hours = np.array([2.0, 0.0, 1.0, 3.0])
+    flow = np.array([100.0, 400.0, 100.0, 100.0])
+    sector, table = scheduler.schedule_sectors(hours, flow, 500.0, groups=np.array([0, 0, 1, 1]))
+    # Both valves fit together once the dry line of valve 0 is left out
+    assert (sector == 0).all()
+    assert table["flow"].tolist() == [300.0]
+    assert table["lines"].tolist() == [3]
+    assert table["hours"].tolist() == [3.0]
+
+
+@pytest.mark.parametrize("groups", [None, np.array([0, 1, 1, 2])])
+def test_non_finite_hours_are_unscheduled(groups):
+    hours = np.array([np.nan, 1.0, np.inf, 2.0])
+    sector, table = scheduler.schedule_sectors(hours, 100.0, 150.0, groups)
+    assert sector[0] == -1
+    assert np.isfinite(table["hours"]).all()
+    assert table["hours"].sum() == 3.0
+    if groups is None:
+        assert sector[2] == -1
+
+
+def test_line_above_pump_capacity():
+    with pytest.raises(ValueError):
+        scheduler.pack_sectors(np.array([1.0, 2.0]), np.array([100.0, 900.0]), 500.0)
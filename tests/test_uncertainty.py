@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+import uncertainty
+
+POINT_VALUES = {"et0": 1100.0, "kc": 0.7, "fc": 0.5, "pe": 150.0, "au": 0.0, "eto_percentage": 1.0,
+                "irrigation_turn": 7, "irrigation_hours": 10.0, "irrigation_efficiency": 0.9,
+                "dripper_flow": 2.0, "dripper_spacing": 0.75, "irrigation_width": 3.0}
+
+
+def test_samples_are_truncated_to_the_physical_range():
+    specs = uncertainty.build_specs(POINT_VALUES, {
+        "irrigation_efficiency": {"dist": "normal", "mean": 0.95, "sd": 0.2},
+        "fc": {"dist": "normal", "mean": 0.05, "sd": 0.2},
+        "kc": {"dist": "uniform", "low": -0.2, "high": 0.8},
+    })
+    samples = uncertainty.sample_parameters(specs, 10000, seed=1)
+    assert samples["irrigation_efficiency"].min() > 0 and samples["irrigation_efficiency"].max() <= 1
+    assert samples["fc"].min() >= 0 and samples["fc"].max() <= 1
+    assert samples["kc"].min() >= 0
+
+
+@pytest.mark.parametrize("spec", [{"dist": "uniform"}, {"dist": "triangular", "low": 0.1},
+                                  {"dist": "weibull", "mean": 1}])
+def test_incomplete_distributions_raise_value_error(spec):
+    with pytest.raises(ValueError):
+        uncertainty.build_specs(POINT_VALUES, {"fc": spec})
+
+
+def test_no_valid_samples():
+    specs = uncertainty.build_specs(dict(POINT_VALUES, fc=0.0), {"kc": {"sd": 0.05}})
+    results = uncertainty.run_uncertainty(specs, n_samples=100, seed=0)
+    assert results["n_valid"] == 0
+    assert "No valid samples" in uncertainty.format_uncertainty_summary(results)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import rasterio
+import rasterio.features
+from rasterio.transform import from_origin
+from shapely import box
+
+from zonal import calculate_zonal_statistics, calculate_zonal_statistics_from_file
+
+TRANSFORM = from_origin(0, 30, 0.1, 0.1)
+
+
+def baseline_means(geometries, dem):
+    # The original per-line loop of gis.calculate_mean_pixel_value
+    means = []
+    for geometry in geometries:
+        mask = rasterio.features.geometry_mask([geometry], transform=TRANSFORM, invert=True, out_shape=dem.shape)
+        masked_dem = dem[mask]
+        means.append(np.mean(masked_dem[masked_dem >= 0]))
+    return np.array(means)
+
+
+@pytest.fixture
+def canopy():
+    # Canopy values in [0, 1] with some pixels outside the mask (negative)
+    dem = np.random.default_rng(5).random((300, 300)).astype(np.float32)
+    dem[dem < 0.1] = -1
+    return dem
+
+
+@pytest.fixture
+def buffers():
+    rows = [box(1, y, 29, y + 1.5) for y in np.arange(1, 8, 1.2)]     # Overlapping neighbours
+    touching = [box(1, y, 29, y + 1.5) for y in np.arange(12, 20, 1.5)]  # Sharing only an edge
+    slanted = [box(3, 22, 27, 23.5).union(box(26, 22, 27.5, 28))]         # Not aligned with the pixels
+    return np.array(rows + touching + slanted, dtype=object)
+
+
+def test_in_memory_matches_the_baseline_loop(canopy, buffers):
+    stats = calculate_zonal_statistics(buffers, canopy, TRANSFORM)
+    np.testing.assert_allclose(stats["mean"], baseline_means(buffers, canopy), rtol=1e-6)
+
+
+@pytest.mark.parametrize("tile_size", [64, 2048])
+def test_tiled_reads_match_the_baseline_loop(tmp_path, canopy, buffers, tile_size):
+    path = str(tmp_path / "canopy.tif")
+    with rasterio.open(path, "w", driver="GTiff", width=300, height=300, count=1, dtype="float32",
+                       transform=TRANSFORM, tiled=True, blockxsize=32, blockysize=32) as dst:
+        dst.write(canopy, 1)
+    stats = calculate_zonal_statistics_from_file(buffers, path, tile_size=tile_size)
+    np.testing.assert_allclose(stats["mean"], baseline_means(buffers, canopy), rtol=1e-6)